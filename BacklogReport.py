@@ -33,6 +33,7 @@ from kernel.DataFactory import DataEngine
 from kernel.NodesBook import helpdeskNodesBook
 
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 from kernel.SheetFormats import SpreadsheetFormats
 from kernel.BacklogFactory import BacklogFactory
 from kernel.DeploymentModel import deploymentBook
@@ -497,9 +498,10 @@ class BacklogReporter:
 
     def get_format(self, issue):
         _timeSlot = issue.timeSlot.split(' ')[1] if issue.timeSlot != 'Unscheduled' else 'Unscheduled'
-        if _timeSlot in agileCalendar.pastTimeSlots:
+        frame = agileCalendar.frameOf(_timeSlot)
+        if frame == 'Implemented':
             return self.spFormats.brown
-        elif _timeSlot in agileCalendar.currentTimeSlots():
+        elif frame == 'Working On':
             return self.spFormats.green
         else:
             return self.spFormats.blue
@@ -1171,6 +1173,7 @@ class BacklogReporter:
         _date = datetime.now().strftime("%Y%m%d-%H%M")
         filename = 'FIWARE.backlog.report.' + chaptername + '.' + _date + '.xlsx'
         myfile = os.path.join(settings.outHome, filename)
+        Manifest.getInstance(settings.outHome).record('backlog.report', chaptername, _date, filename)
         self.workbook = xlsxwriter.Workbook(myfile)
         self.spFormats = SpreadsheetFormats(self.workbook)
         self._techChapters_dashboard()
@@ -1286,6 +1289,7 @@ class BacklogReporter:
         _date = datetime.now().strftime("%Y%m%d-%H%M")
         filename = 'FIWARE.backlog.report.lab.' + _date + '.xlsx'
         myfile = os.path.join(settings.outHome, filename)
+        Manifest.getInstance(settings.outHome).record('backlog.report', 'lab', _date, filename)
         self.workbook = xlsxwriter.Workbook(myfile)
         self.spFormats = SpreadsheetFormats(self.workbook)
         self._lab_chapter_dashboard()
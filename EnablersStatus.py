@@ -5,6 +5,7 @@ from datetime import datetime
 from xlsxwriter.utility import xl_range
 from kernel.Calendar import agileCalendar
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 from kernel.SheetFormats import SpreadsheetFormats
 from kernel.TrackerBook import chaptersBook
 
@@ -86,6 +87,7 @@ def main():
 
     filename = 'FIWARE.backlog.enablerStatus.sprint-' + _sprint + '.' + _date + '.xlsx'
     myfile = os.path.join(settings.outHome, filename)
+    Manifest.getInstance(settings.outHome).record('backlog.enablerStatus', 'sprint-' + _sprint, _date, filename)
     report.workbook = xlsxwriter.Workbook(myfile)
     report.spFormats = SpreadsheetFormats(report.workbook)
     report.write()
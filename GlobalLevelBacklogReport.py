@@ -32,6 +32,7 @@ from kernel.TrackerBook import coordinationBook
 from kernel.DataFactory import DataEngine
 
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 from kernel.SheetFormats import SpreadsheetFormats
 from kernel.BacklogFactory import BacklogFactory
 # from kernel.DeploymentModel import deploymentBook
@@ -465,9 +466,10 @@ class GlobalBacklogReporter:
 
     def get_format(self, issue):
         _timeSlot = issue.timeSlot.split(' ')[1] if issue.timeSlot != 'Unscheduled' else 'Unscheduled'
-        if _timeSlot in agileCalendar.pastTimeSlots:
+        frame = agileCalendar.frameOf(_timeSlot)
+        if frame == 'Implemented':
             return self.spFormats.brown
-        elif _timeSlot in agileCalendar.currentTimeSlots():
+        elif frame == 'Working On':
             return self.spFormats.green
         else:
             return self.spFormats.blue
@@ -620,6 +622,7 @@ class GlobalBacklogReporter:
         _date = datetime.now().strftime("%Y%m%d-%H%M")
         filename = 'FIWARE.backlog.report.' + name + '.' + _date + '.xlsx'
         myfile = os.path.join(settings.outHome, filename)
+        Manifest.getInstance(settings.outHome).record('backlog.report', name, _date, filename)
         self.workbook = xlsxwriter.Workbook(myfile)
         self.spFormats = SpreadsheetFormats(self.workbook)
 
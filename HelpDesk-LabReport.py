@@ -15,6 +15,7 @@ from kernel.NM_HelpDeskReporter import DeckReporter, TechChapterReporter, LabCha
 from kernel.Reporter import CoordinationReporter
 
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 from kernel.SheetFormats import SpreadsheetFormats
 from kernel.UploaderTool import Uploader
 from kernel.NodesBook import helpdeskNodesBook
@@ -912,6 +913,7 @@ class HelpDeskLabReporter:
         _date = datetime.now().strftime("%Y%m%d-%H%M")
         filename = 'FIWARE.helpdesk-lab.report.' + _date + '.xlsx'
         myfile = os.path.join(settings.outHome, filename)
+        Manifest.getInstance(settings.outHome).record('helpdesk-lab.report', '', _date, filename)
 
         self.workbook = xlsxwriter.Workbook(myfile)
         self.spFormats = SpreadsheetFormats(self.workbook)
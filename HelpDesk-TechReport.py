@@ -16,6 +16,7 @@ from kernel.NM_HelpDeskReporter import DeckReporter, TechChapterReporter, TechCh
 from kernel.Reporter import CoordinationReporter
 
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 from kernel.SheetFormats import SpreadsheetFormats
 from kernel.UploaderTool import Uploader
 
@@ -1035,6 +1036,7 @@ class HelpDeskReporter:
 
         filename = 'FIWARE.helpdesk-tech.report.' + chaptername + '.' + _date + '.xlsx'
         myfile = os.path.join(settings.outHome, filename)
+        Manifest.getInstance(settings.outHome).record('helpdesk-tech.report', chaptername, _date, filename)
         self.workbook = xlsxwriter.Workbook(myfile)
         self.spFormats = SpreadsheetFormats(self.workbook)
         self._tech_channel_help_desk()
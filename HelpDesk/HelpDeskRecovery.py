@@ -1,8 +1,7 @@
 __author__ = "Manuel Escriche <mev@tid.es>"
 
 import os
-import base64
-import requests
+import logging
 import xlsxwriter
 import re
 from datetime import date, datetime
@@ -10,9 +9,12 @@ from xlsxwriter.utility import xl_range
 from operator import attrgetter
 from collections import namedtuple
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 from kernel.SheetFormats import SpreadsheetFormats
 from kernel.TrackerBook import trackersBookByKey
 from kernel.IssuesList import IssuesList
+from kernel.FieldsBook import fieldsBook
+from kernel.JiraClient import JiraClient, iterIssues
 
 
 class Connector:
@@ -31,46 +33,27 @@ class Connector:
         return cls._singlenton
 
     def __init__(self):
-        self.jiraSession = self._connect(settings.server['JIRA'])
-        self.jiraTestSession = self._connect(settings.server['JIRATEST'])
-
-    def _connect(self, server):
-        username = server.username
-        password = server.password
-        auth = '{}:{}'.format(username, password)
-        keyword = base64.b64encode(bytes(auth, 'utf-8'))
-        access_key = str(keyword)[2:-1]
-        headers = {'Content-Type': 'application/json', "Authorization": "Basic {}".format(access_key)}
-        root_url = 'http://{}'.format(server.domain)
-
-        session = requests.session()
-
-        url = '{}{}'.format(root_url, Connector.url_api['session'])
-        try:
-            session.get(url, headers = headers, verify=False)
-        except Exception:
-            raise Exception
-
-        session.headers.update({'Content-Type': 'application/json'})
-        return session
+        self.jiraSession = JiraClient.getInstance('JIRA').session
 
     def _search(self, server, params):
-        root_url = 'http://{}'.format(server.domain)
-        url = '{}{}'.format(root_url, Connector.url_api['search'])
+        client = JiraClient.getInstance(server)
+        url = '{}{}'.format(client.root_url, Connector.url_api['search'])
         try:
-            answer = self.jiraSession.get(url, params=params, verify=False)
+            answer = client.get(url, params=params)
         except Exception:
             raise Exception
         return answer.json()
 
     def search(self, server, params):
-        data = self._search(settings.server[server], params)
+        data = self._search(server, params)
         return data
 
+    def iterSearch(self, server, params):
+        return iterIssues(lambda _params: self._search(server, _params), params, settings.http['workers'])
+
 
 class IssuesFactory:
-    fields = 'summary,status,project,components,priority,issuetype,description,reporter,' \
-             'resolution,assignee,created,updated,duedate,resolutiondate,fixVersions,releaseDate,issuelinks'
+    consumers = ('kernel.IssuesList.SimpleIssue',)
     _singlenton = None
 
     def __new__(cls, *args, **kwargs):
@@ -85,10 +68,10 @@ class IssuesFactory:
         tracker = trackersBookByKey['HELP'].keystone
         startAt = 0
         if request == 'recovery':
-            payloadTest = { 'fields': IssuesFactory.fields,
+            payloadTest = { 'fields': fieldsBook.query(*IssuesFactory.consumers),
                         'maxResults':1000, 'startAt':startAt,
                         'jql':"created >= 2015-03-04 AND created <= 2015-05-12 AND project = {}".format(tracker) }
-            payloadMain = { 'fields': IssuesFactory.fields,
+            payloadMain = { 'fields': fieldsBook.query(*IssuesFactory.consumers),
                         'maxResults':1000, 'startAt':startAt,
                         'jql':"project = {}".format(tracker) }
             try:
@@ -96,17 +79,12 @@ class IssuesFactory:
                 data = self.connector.search('JIRATEST',payloadTest)
                 testHelpDeskRecoveryList = IssuesList.fromData('helpdesktest.recovery', data['issues'])
 
-                data = self.connector.search('JIRA', payloadMain)
-                totalIssues, receivedIssues = data['total'], len(data['issues'])
-                while totalIssues > receivedIssues:
-                    payloadMain['startAt'] = receivedIssues
-                    try:
-                        data['issues'].extend(self.connector.search('JIRA', payloadMain)['issues'])
-                    except Exception: raise Exception
-                    receivedIssues = len(data['issues'])
-
-                actualHelpDeskRecoveryList = IssuesList.fromData('helpdesk.recovery', data['issues'])
-            except Exception:
+                issues = self.connector.iterSearch('JIRA', payloadMain)
+
+                actualHelpDeskRecoveryList = IssuesList.fromData('helpdesk.recovery', issues)
+            except Exception as e:
+                logging.warning('JIRA search failed ({}): {} recovery read from the last files saved'
+                                .format(type(e).__name__, tracker))
                 testHelpDeskRecoveryList = IssuesList.fromFile('helpdesktest.recovery')
                 actualHelpDeskRecoveryList = IssuesList.fromFile('helpdesk.recovery')
 
@@ -116,10 +94,10 @@ class IssuesFactory:
         tracker = 'HELC'
         startAt = 0
         if request == 'recovery':
-            payloadTest = { 'fields': IssuesFactory.fields,
+            payloadTest = { 'fields': fieldsBook.query(*IssuesFactory.consumers),
                         'maxResults':1000, 'startAt':startAt,
                         'jql':"created >= 2015-03-04 AND created <= 2015-05-12 AND project = {}".format(tracker) }
-            payloadMain = { 'fields': IssuesFactory.fields,
+            payloadMain = { 'fields': fieldsBook.query(*IssuesFactory.consumers),
                         'maxResults':1000, 'startAt':startAt,
                         'jql':"project = {}".format(tracker) }
             try:
@@ -127,17 +105,12 @@ class IssuesFactory:
                 data = self.connector.search('JIRATEST',payloadTest)
                 testHelpDeskRecoveryList = IssuesList.fromData('coachhelpdesktest.recovery', data['issues'])
 
-                data = self.connector.search('JIRA', payloadMain)
-                totalIssues, receivedIssues = data['total'], len(data['issues'])
-                while totalIssues > receivedIssues:
-                    payloadMain['startAt'] = receivedIssues
-                    try:
-                        data['issues'].extend(self.connector.search('JIRA', payloadMain)['issues'])
-                    except Exception: raise Exception
-                    receivedIssues = len(data['issues'])
-
-                actualHelpDeskRecoveryList = IssuesList.fromData('coachhelpdesk.recovery', data['issues'])
-            except Exception:
+                issues = self.connector.iterSearch('JIRA', payloadMain)
+
+                actualHelpDeskRecoveryList = IssuesList.fromData('coachhelpdesk.recovery', issues)
+            except Exception as e:
+                logging.warning('JIRA search failed ({}): {} recovery read from the last files saved'
+                                .format(type(e).__name__, tracker))
                 testHelpDeskRecoveryList = IssuesList.fromFile('coachhelpdesktest.recovery')
                 actualHelpDeskRecoveryList = IssuesList.fromFile('coachhelpdesk.recovery')
 
@@ -544,6 +517,7 @@ class Report:
         filename = 'FIWARE.helpdesk.recovery.'+ _date + '.xlsx'
         # filename = 'FIWARE.coachhelpdesk.recovery.'+ _date + '.xlsx'
         myfile = os.path.join(settings.outHome, filename)
+        Manifest.getInstance(settings.outHome).record('helpdesk.recovery', '', _date, filename)
         self.workbook = xlsxwriter.Workbook(myfile)
         self.spFormats = SpreadsheetFormats(self.workbook)
         self._helpdesk_report()
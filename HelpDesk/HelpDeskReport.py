@@ -1,7 +1,6 @@
 __author__ = "Manuel Escriche <mev@tid.es>"
 import os
-import base64
-import requests
+import logging
 import xlsxwriter
 import re
 from datetime import date, datetime
@@ -9,9 +8,12 @@ from xlsxwriter.utility import xl_range
 from operator import attrgetter
 from collections import namedtuple
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 from kernel.SheetFormats import SpreadsheetFormats
 from kernel.TrackerBook import trackersBookByKey
 from kernel.IssuesList import IssuesList
+from kernel.FieldsBook import fieldsBook
+from kernel.JiraClient import JiraClient, iterIssues
 
 
 class Connector:
@@ -30,47 +32,27 @@ class Connector:
         return cls._singlenton
 
     def __init__(self):
-        self.jiraSession = self._connect(settings.server['JIRA'])
-        self.jiraTestSession = self._connect(settings.server['JIRATEST'])
-
-    def _connect(self, server):
-        username = server.username
-        password = server.password
-        auth = '{}:{}'.format(username, password)
-        keyword = base64.b64encode(bytes(auth,'utf-8'))
-        access_key = str(keyword)[2:-1]
-        headers = {'Content-Type': 'application/json', "Authorization": "Basic {}".format(access_key)}
-        root_url = 'http://{}'.format(server.domain)
-        # print(self.root_url)
-        session = requests.session()
-
-        url = '{}{}'.format(root_url, Connector.url_api['session'])
-        try:
-            session.get(url, headers=headers, verify=False)
-        except Exception:
-            raise Exception
-
-        session.headers.update({'Content-Type': 'application/json'})
-        return session
+        self.jiraSession = JiraClient.getInstance('JIRA').session
 
     def _search(self, server, params):
-        root_url = 'http://{}'.format(server.domain)
-        url = '{}{}'.format(root_url, Connector.url_api['search'])
+        client = JiraClient.getInstance(server)
+        url = '{}{}'.format(client.root_url, Connector.url_api['search'])
         try:
-            answer = self.jiraSession.get(url, params=params, verify=False)
+            answer = client.get(url, params=params)
         except Exception:
             raise Exception
         return answer.json()
 
     def search(self, server, params):
-        # print('search')
-        data = self._search(settings.server[server], params)
+        data = self._search(server, params)
         return data
 
+    def iterSearch(self, server, params):
+        return iterIssues(lambda _params: self._search(server, _params), params, settings.http['workers'])
+
 
 class IssuesFactory:
-    fields = 'summary,status,project,components,priority,issuetype,description,reporter,' \
-             'resolution,assignee,created,updated,duedate,resolutiondate,fixVersions,releaseDate,issuelinks'
+    consumers = ('kernel.IssuesList.SimpleIssue',)
     _singlenton = None
 
     def __new__(cls, *args, **kwargs):
@@ -85,22 +67,16 @@ class IssuesFactory:
         tracker = trackersBookByKey['HELP'].keystone
         startAt = 0
         if request == 'report':
-            payloadMain = {'fields': IssuesFactory.fields,
+            payloadMain = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                            'maxResults': 1000, 'startAt': startAt,
                            'jql': "project = {}".format(tracker)}
             try:
                 # raise Exception
-                data = self.connector.search('JIRA', payloadMain)
-                totalIssues, receivedIssues = data['total'], len(data['issues'])
-                while totalIssues > receivedIssues:
-                    payloadMain['startAt'] = receivedIssues
-                    try:
-                        data['issues'].extend(self.connector.search('JIRA', payloadMain)['issues'])
-                    except Exception: raise Exception
-                    receivedIssues = len(data['issues'])
-            # print('total=', totalIssues, ' received=', receivedIssues)
-                actualHelpDeskRecoveryList = IssuesList.fromData('helpdesk.report', data['issues'])
-            except Exception:
+                issues = self.connector.iterSearch('JIRA', payloadMain)
+                actualHelpDeskRecoveryList = IssuesList.fromData('helpdesk.report', issues)
+            except Exception as e:
+                logging.warning('JIRA search failed ({}): {} report read from the last file saved'
+                                .format(type(e).__name__, tracker))
                 actualHelpDeskRecoveryList = IssuesList.fromFile('helpdesk.report')
 
         return actualHelpDeskRecoveryList
@@ -109,22 +85,16 @@ class IssuesFactory:
         tracker = 'HELC'
         startAt = 0
         if request == 'report':
-            payloadMain = {'fields': IssuesFactory.fields,
+            payloadMain = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                            'maxResults': 1000, 'startAt': startAt,
                            'jql': "project = {}".format(tracker)}
 
             try:
-                data = self.connector.search('JIRA', payloadMain)
-                totalIssues, receivedIssues = data['total'], len(data['issues'])
-                while totalIssues > receivedIssues:
-                    payloadMain['startAt'] = receivedIssues
-                    try:
-                        data['issues'].extend(self.connector.search('JIRA', payloadMain)['issues'])
-                    except Exception: raise Exception
-                    receivedIssues = len(data['issues'])
-            # print('total=', totalIssues, ' received=', receivedIssues)
-                actualHelpDeskRecoveryList = IssuesList.fromData('coachhelpdesk.report', data['issues'])
-            except Exception:
+                issues = self.connector.iterSearch('JIRA', payloadMain)
+                actualHelpDeskRecoveryList = IssuesList.fromData('coachhelpdesk.report', issues)
+            except Exception as e:
+                logging.warning('JIRA search failed ({}): {} report read from the last file saved'
+                                .format(type(e).__name__, tracker))
                 actualHelpDeskRecoveryList = IssuesList.fromFile('coachhelpdesk.report')
 
         return actualHelpDeskRecoveryList
@@ -334,6 +304,7 @@ class Report:
         filename = 'FIWARE.helpdesk.report.' + _date + '.xlsx'
         # filename = 'FIWARE.coachhelpdesk.recovery.'+ _date + '.xlsx'
         myfile = os.path.join(settings.outHome, filename)
+        Manifest.getInstance(settings.outHome).record('helpdesk.report', '', _date, filename)
         self.workbook = xlsxwriter.Workbook(myfile)
         self.spFormats = SpreadsheetFormats(self.workbook)
         self._helpdesk_report()
@@ -1,153 +1,169 @@
 import os
 import re
+import copy
 import pickle
+import multiprocessing
 
 from datetime import date, datetime
-from collections import Counter, defaultdict, namedtuple
+from collections import Counter, namedtuple
 from operator import attrgetter
 
 from kernel.Settings import settings
 from kernel.Calendar import agileCalendar
-from kernel.TrackerBook import trackersBookByName, trackersBook, chaptersBookByKey
+from kernel.TrackerBook import trackersBookByName, trackersBookByKey, trackersBook, chaptersBookByKey
 from kernel.ComponentsBook import coordinationBook, enablersBookByKey, enablersBook, toolsBook
 from kernel.Connector import Connector
 from kernel.Reviewer import Reviewer
 from kernel.Publisher import Publisher
-from kernel.DataFactory import DataEngine
+from kernel.DataFactory import DataEngine, TrackersData
+from kernel.Manifest import Manifest
+from kernel.FieldsBook import fieldsBook
+from kernel.IssueRecord import IssueRecord
+from kernel.DateParser import jiraDate
 
 __author__ = "Manuel Escriche <mev@tid.es>"
 
 
+class _NotTested(dict):
+    # rules not run on an issue read as 'NT'
+    def __missing__(self, key):
+        return 'NT'
+
+
 class TestRecord:
+    __slots__ = ('test', 'status')
+
     def __init__(self):
-        self.test = defaultdict(lambda: 'NT')
-        self.status = defaultdict(lambda: 'NT')
+        self.test = _NotTested()
+        self.status = _NotTested()
 
     @property
     def gStatus(self):
         return 'OK' if all([v == 'OK' for v in self.status.values() if v != 'NT']) else 'KO'
 #
 
-class Issue(dict):
+class Kin(tuple):
+    """
+    Fathers or sons of an issue: one tuple per reference, shared by all the issues having it.
+    Members of some issue types and their statuses are gathered once per tuple, on first request.
+    """
+    def __new__(cls, items=()):
+        kin = super().__new__(cls, items)
+        kin._groups = dict()
+        return kin
+
+    def of(self, types):
+        # (members of the given types, set of their statuses)
+        if types not in self._groups:
+            members = tuple(item for item in self if item.issueType in types)
+            self._groups[types] = (members, frozenset(item.status for item in members))
+        return self._groups[types]
+
+
+class Issue(IssueRecord):
     _timeFrames = ('Foreseen', 'Working On', 'Implemented')
+    _jiraFields = ('summary', 'status', 'project', 'components', 'priority', 'issuetype', 'description', 'reporter',
+                   'resolution', 'assignee', 'created', 'updated', 'duedate', 'resolutiondate', 'fixVersions')
+    _fields = ('key', 'tracker_key', 'cmp_key', 'summary', 'status', 'priority', 'issueType', 'description',
+               'dissemination', 'reporter', 'resolution', 'assignee', 'duedate', 'created', 'updated', 'resolved',
+               'version', 'nVersions', 'releaseDate', 'jurl', 'purl', 'frame')
+    __slots__ = _fields + ('backlog', 'openDescription', 'test', 'father', 'sons')
+    project = 'FIWARE'
 
     def __init__(self, issue):
-        super().__init__()
         # print(issue['fields'])
         self.backlog = None
         self.openDescription = None
-        self.project = 'FIWARE'
         self.test = TestRecord()
 
-        self['key'] = issue['key']
+        fields = issue['fields']
+        self.key = issue['key']
 
-        self['tracker_key'] = issue['fields']['project']['key']
+        self.tracker_key = fields['project']['key']
         # print(issue['fields']['project']['key'])
         # self.tracker = trackersBook.getTracker(self['_project'])
         # print(self.tracker)
         try:
-            self['cmp_key'] = [item['id'] for item in issue['fields']['components']][0]
+            self.cmp_key = [item['id'] for item in fields['components']][0]
         except Exception:
-            self['cmp_key'] = None
+            self.cmp_key = None
         # self.enabler = enablersBook.get_enabler(self['component']) if len(self['component']) > 0 else None
         # self.enabler = enablersBook.getEnabler(self.tracker.keystone, self['component']) \
         #    if len(self['component']) > 0 and self.tracker else None
         # print(issue['fields']['project'])
 
 
-        self['summary'] = issue['fields']['summary'].strip()
-        self['status'] = issue['fields']['status']['name']
+        self.summary = fields['summary'].strip()
+        self.status = fields['status']['name']
 
         try:
-            self['priority'] = issue['fields']['priority']['name']
+            self.priority = fields['priority']['name']
         except TypeError:
             print(issue)
 
-        self['issueType'] = issue['fields']['issuetype']['name']
-        self['description'] = issue['fields']['description']
+        self.issueType = fields['issuetype']['name']
+        self.description = fields.get('description')
 
-        self['dissemination'] = enablersBookByKey[self['cmp_key']].dissemination \
-            if self['issueType'] in ('Feature', 'Epic') and self['cmp_key'] in enablersBookByKey else 'Private'
+        self.dissemination = enablersBookByKey[self.cmp_key].dissemination \
+            if self.issueType in ('Feature', 'Epic') and self.cmp_key in enablersBookByKey else 'Private'
 
-        self['reporter'] = issue['fields']['reporter']['displayName']
+        try:
+            self.reporter = fields['reporter']['displayName']
+        except Exception:
+            self.reporter = None
 
-        if issue['fields']['resolution'] != None:
-            self['resolution'] = issue['fields']['resolution']['name'] \
-            if 'name' in issue['fields']['resolution'] else None
+        if fields['resolution'] != None:
+            self.resolution = fields['resolution']['name'] \
+            if 'name' in fields['resolution'] else None
         else:
-            self['resolution'] = None
+            self.resolution = None
 
-        if issue['fields']['assignee'] != None:
-            self['assignee'] = issue['fields']['assignee']['displayName'] \
-                if 'displayName' in issue['fields']['assignee'] else None
-        else: self['assignee'] = None
+        if fields['assignee'] != None:
+            self.assignee = fields['assignee']['displayName'] \
+                if 'displayName' in fields['assignee'] else None
+        else: self.assignee = None
 
-        if 'duedate' in issue['fields']:
-            self['duedate'] = datetime.strptime(issue['fields']['duedate'][:10], '%Y-%m-%d').date() \
-                if issue['fields']['duedate'] else None
-        else:
-            self['duedate'] = None
+        self.duedate = jiraDate(fields.get('duedate'))
 
-        self['created'] =  datetime.strptime(issue['fields']['created'][:10], '%Y-%m-%d').date()
-        self['updated'] = datetime.strptime(issue['fields']['updated'][:10], '%Y-%m-%d').date()
+        self.created = jiraDate(fields['created'])
+        self.updated = jiraDate(fields['updated'])
 
-        if 'resolutiondate' in issue['fields']:
-            self['resolved'] = datetime.strptime(issue['fields']['resolutiondate'][:10], '%Y-%m-%d').date()  \
-                if issue['fields']['resolutiondate'] else None
-        else:
-            self['resolved'] = None
+        self.resolved = jiraDate(fields.get('resolutiondate'))
 
-        self['version'] = 'Unscheduled'
-        self['nVersions'] = 0
-        if 'fixVersions' in issue['fields']:
-            self['nVersions'] = len(issue['fields']['fixVersions'])
-            if len(issue['fields']['fixVersions']) > 0:
-                self['version'] = issue['fields']['fixVersions'][0]['name']
-                self['releaseDate'] = datetime.strptime(issue['fields']['fixVersions'][0]['releaseDate'][:10], '%Y-%m-%d').date()
+        self.version = 'Unscheduled'
+        self.nVersions = 0
+        if 'fixVersions' in fields:
+            self.nVersions = len(fields['fixVersions'])
+            if len(fields['fixVersions']) > 0:
+                self.version = fields['fixVersions'][0]['name']
+                self.releaseDate = jiraDate(fields['fixVersions'][0]['releaseDate'])
 
-        self['jurl'] = "http://jira.fiware.org/browse/{}".format(issue['key'])
-        self['purl'] = "http://forge.fiware.org/plugins/mediawiki/wiki/fiware/index.php/{}".format(self['summary']) \
-            if self['dissemination'] == 'Open' else None
+        self.jurl = "http://jira.fiware.org/browse/{}".format(issue['key'])
+        self.purl = "http://forge.fiware.org/plugins/mediawiki/wiki/fiware/index.php/{}".format(self.summary) \
+            if self.dissemination == 'Open' else None
 
 
-        _version = self['version'].split()
+        _version = self.version.split()
         if len(_version) == 1:
             version = 'Unscheduled'
         else:
             version = _version[1]
 
-        if version == 'Unscheduled':
-            self['frame'] = 'Foreseen'
-        elif version in agileCalendar.pastTimeSlots:
-            self['frame'] = 'Implemented'
-        elif version in agileCalendar.currentTimeSlots():
-            self['frame'] = 'Working On'
-        elif version in agileCalendar.futureTimeSlots:
-            self['frame'] = 'Foreseen'
-        else:
-            self['frame'] = 'Unknown'
+        self.frame = agileCalendar.frameOf(version)
 
         self.father = None
         self.sons = None
 
     def name_test(self):
-        chunks = self['summary'].split('.')
+        chunks = self.summary.split('.')
         if len(chunks) < 3: return False
         project = chunks[0]
         issueType = chunks[1]
-        return True if project == 'FIWARE' and issueType == self['issueType'] else False
-
-    @property
-    def key(self):
-        return self['key']
+        return True if project == 'FIWARE' and issueType == self.issueType else False
 
     @property
     def nkey(self):
-        return int(self['key'].split('-')[1])
-
-    @property
-    def frame(self):
-        return self['frame']
+        return int(self.key.split('-')[1])
 
     @property
     def name(self):
@@ -155,98 +171,54 @@ class Issue(dict):
 
     @property
     def shortReference(self):
-        _name = self['summary'].split('.')
+        _name = self.summary.split('.')
         return '.'.join(_name[2:])
 
     @property
     def reference(self):
-        return self['summary']
-
-    @property
-    def issueType(self):
-        return self['issueType']
-
-    @property
-    def priority(self):
-        return self['priority']
-
-    @property
-    def status(self):
-        return self['status']
-
-    @property
-    def resolution(self):
-        return self['resolution']
-
-    @property
-    def created(self):
-        return self['created']
-
-    @property
-    def resolved(self):
-        return self['resolved']
-
-    @property
-    def updated(self):
-        return self['updated']
+        return self.summary
 
     @property
     def released(self):
         return self['releaseDate']
 
-    @property
-    def nVersions(self):
-        return self['nVersions']
-
     @property
     def timeSlot(self):
-        return self['version']
+        return self.version
 
     @property
     def nTimeSlot(self):
-        return self['version'].split()[1]
-
-    @property
-    def assignee(self):
-        return self['assignee']
+        return self.version.split()[1]
 
     @property
     def age(self):
-        return (date.today() - self['created']).days
-
-    @property
-    def duedate(self):
-        return self['duedate']
+        return (date.today() - self.created).days
 
     @property
     def delay(self):
-        if self['resolved'] and self['duedate']:
-            return (self['resolved'] - self['duedate']).days
+        if self.resolved and self.duedate:
+            return (self.resolved - self.duedate).days
         return (date.today() - self.duedate).days
 
     @property
     def tracker(self):
-        return self['tracker_key']
+        return self.tracker_key
 
     @property
     def chapter(self):
-        return chaptersBookByKey[self['tracker_key']].name
+        return chaptersBookByKey[self.tracker_key].name
 
     @property
     def component(self):
-        return self['cmp_key']
-
-    @property
-    def dissemination(self):
-        return self['dissemination']
+        return self.cmp_key
 
     @property
     def url(self):
-        return self['jurl']
+        return self.jurl
 
     @property
     def p_url(self):
-        return self['purl']
+        return self.purl
 
     @property
     def OKtests(self):
@@ -280,7 +252,28 @@ class Issue(dict):
         return '>>> rule not found'
 
     def __repr__(self):
-        return '{1},{0.key},{2}'.format(self, self['tracker_key'], self['cmp_key'])
+        return '{0.tracker_key},{0.key},{0.cmp_key}'.format(self)
+
+
+# issues under review in a review process, given to it by the pool initializer
+_reviewed = None
+_reviewer = None
+
+
+def _initReview(issues):
+    # issues come without their father and sons: the hierarchy is built again here
+    global _reviewed, _reviewer
+    Backlog.hierarchy(issues)
+    _reviewed = issues
+    _reviewer = Reviewer()
+
+
+def _reviewChunk(start, end):
+    # reviewer rules, in their order, over issues start to end: their test records
+    for issue in _reviewed[start:end]:
+        for rule in _reviewer.testBook:
+            _reviewer.testBook[rule](issue)
+    return [issue.test for issue in _reviewed[start:end]]
 
 
 class Backlog(list):
@@ -320,14 +313,12 @@ class Backlog(list):
     def review(self):
         # print('review')
                 ### build hierarchy
-        for item in self:
-            item.father = [item1 for item1 in self if item.shortReference.rpartition('.')[0] == item1.shortReference]
-            item.sons = [item1 for item1 in self if item.shortReference == item1.shortReference.rpartition('.')[0]]
+        Backlog.hierarchy(self)
+
+        self._reviewIssues()
 
+        # publisher rules read web pages and cached documents: they run here, after the reviewer ones
         for issue in self:
-            # print(issue.reference)
-            for rule in self.reviewer.testBook:
-                self.reviewer.testBook[rule](issue)
             if issue.OKtests and issue.dissemination == 'Open':
                 for rule in self.publisher.testBook:
                     self.publisher.testBook[rule](issue)
@@ -335,6 +326,52 @@ class Backlog(list):
             # print(issue.test.status)
             # print(issue.test.test)
 
+    @staticmethod
+    def hierarchy(items):
+        # issues by their reference and by the reference of their parent, in backlog order;
+        # issues with the same reference share their father and sons
+        references = [(item, item.shortReference) for item in items]
+        byReference, byParent = dict(), dict()
+        for item, reference in references:
+            byReference.setdefault(reference, []).append(item)
+            byParent.setdefault(reference.rpartition('.')[0], []).append(item)
+        byReference = {reference: Kin(byReference[reference]) for reference in byReference}
+        byParent = {reference: Kin(byParent[reference]) for reference in byParent}
+        for item, reference in references:
+            item.father = byReference.get(reference.rpartition('.')[0], Kin())
+            item.sons = byParent.get(reference, Kin())
+
+    def _reviewIssues(self):
+        # reviewer rules only read the issue, its father and sons, and the books: chunks of a large
+        # backlog are reviewed in spawned processes, each one given all the issues to rebuild the
+        # hierarchy from and returning the test records of its chunk
+        workers = settings.review['workers'] if settings.review['workers'] else os.cpu_count()
+        if workers < 2 or len(self) < settings.review['parallel']:
+            for issue in self:
+                for rule in self.reviewer.testBook:
+                    self.reviewer.testBook[rule](issue)
+            return
+
+        size = -(-len(self) // (4 * workers))
+        chunks = [(start, min(start + size, len(self))) for start in range(0, len(self), size)]
+        with multiprocessing.get_context('spawn').Pool(workers, _initReview, (self._detached(),)) as pool:
+            results = pool.starmap(_reviewChunk, chunks)
+
+        for (start, end), records in zip(chunks, results):
+            for issue, record in zip(self[start:end], records):
+                issue.test = record
+
+    def _detached(self):
+        # flat copies of the issues for the review processes: same fields, no father and sons,
+        # no backlog (nor its reviewer and publisher) and no test results yet
+        copies = list()
+        for issue in self:
+            item = copy.copy(issue)
+            item.backlog = item.father = item.sons = None
+            item.test = TestRecord()
+            copies.append(item)
+        return copies
+
     @property
     def impeded(self):
         return Backlog([issue for issue in self if issue.status == 'Impeded'])
@@ -407,8 +444,7 @@ class Backlog(list):
 
 class BacklogFactory:
     _fields = '*navigable'
-    fields = 'summary,status,project,components,priority,issuetype,description,reporter,' \
-             'resolution,assignee,created,updated,duedate,resolutiondate,fixVersions,releaseDate'
+    consumers = ('kernel.Backlog.Issue', 'kernel.Reviewer.BacklogItemRule', 'kernel.Publisher.PublisherItemRule')
 
     instance = None
 
@@ -446,95 +482,38 @@ class BacklogFactory:
 
     def _getComponentsBacklog(self, comp_ids):
         # print('_getComponentsBacklog')
-        startAt = 0
-        payload = {'fields': BacklogFactory.fields,
-                    'maxResults': 1000, 'startAt': startAt,
-                    'jql': 'component in ({})'.format(comp_ids)}
-        try:
-            data = self.connector.search(payload)
-        except:
-            raise Exception
-
-        totalIssues, receivedIssues = data['total'], len(data['issues'])
-        while totalIssues > receivedIssues:
-            payload['startAt'] = receivedIssues
-            data['issues'].extend(self.connector.search(payload)['issues'])
-            receivedIssues = len(data['issues'])
-            # print('total=', totalIssues, ' received=', receivedIssues)
-        return Backlog.fromData(data['issues'])
+        payload = {'fields': fieldsBook.query(*BacklogFactory.consumers),
+                   'maxResults': 1000, 'startAt': 0,
+                   'jql': 'component in ({})'.format(comp_ids)}
+
+        return Backlog.fromData(self.connector.iterSearch(payload))
 
     def _getComponentBacklog(self, comp_id):
         # print('_getComponentBacklog')
-        startAt = 0
-        payload = {'fields': BacklogFactory.fields,
-                   'maxResults': 1000, 'startAt': startAt,
+        payload = {'fields': fieldsBook.query(*BacklogFactory.consumers),
+                   'maxResults': 1000, 'startAt': 0,
                    'jql': 'component={}'.format(comp_id)}
 
-        try:
-            data = self.connector.search(payload)
-        except:
-            raise Exception
-
-        totalIssues, receivedIssues = data['total'], len(data['issues'])
-        while totalIssues > receivedIssues:
-            payload['startAt'] = receivedIssues
-            data['issues'].extend(self.connector.search(payload)['issues'])
-            receivedIssues = len(data['issues'])
-
-        # print(len(data['issues']))
-        return Backlog.fromData(data['issues'])
+        return Backlog.fromData(self.connector.iterSearch(payload))
 
     def _getTrackersBacklog(self, trackertype):
         # print('_getTrackersBacklog')
         trackers = ','.join(trackersBook[tracker].keystone for tracker in trackersBook if trackersBook[tracker].type == trackertype)
-        startAt = 0
-        payload = {'fields': BacklogFactory.fields,
-                    'maxResults': 1000, 'startAt': startAt,
-                    'jql': 'project in ({})'.format(trackers)}
-        try:
-            data = self.connector.search(payload)
-        except:
-            raise Exception
-
-        totalIssues, receivedIssues = data['total'], len(data['issues'])
+        payload = {'fields': fieldsBook.query(*BacklogFactory.consumers),
+                   'maxResults': 1000, 'startAt': 0,
+                   'jql': 'project in ({})'.format(trackers)}
 
-        while totalIssues > receivedIssues:
-            payload['startAt'] = receivedIssues
-            try:
-                data['issues'].extend(self.connector.search(payload)['issues'])
-            except:
-                raise Exception
-
-            receivedIssues = len(data['issues'])
-        return Backlog.fromData(data['issues'])
+        return Backlog.fromData(self.connector.iterSearch(payload))
 
     def _getTrackerBacklog(self, trackername):
         # print('_getTrackerBacklog')
         tracker = trackersBook[trackername]
-        startAt = 0
-        payload = {'fields': BacklogFactory.fields,
-                   'maxResults': 1000, 'startAt': startAt,
+        payload = {'fields': fieldsBook.query(*BacklogFactory.consumers),
+                   'maxResults': 1000, 'startAt': 0,
                    'jql': 'project={}'.format(tracker.keystone)}
-        try:
-            data = self.connector.search(payload)
-        except:
-            raise Exception
-
-        totalIssues, receivedIssues = data['total'], len(data['issues'])
-        # print('total=', totalIssues, ' received=', receivedIssues)
-        while totalIssues > receivedIssues:
-            payload['startAt'] = receivedIssues
-            try:
-                data['issues'].extend(self.connector.search(payload)['issues'])
-            except:
-                raise Exception
-
-            receivedIssues = len(data['issues'])
-            # print('total=', totalIssues, ' received=', receivedIssues)
-        if 'issues' not in data:
-            return
 
-        return Backlog.fromData(data['issues'])
+        # issues are turned into backlog items page by page as they arrive
+        return Backlog.fromData(self.connector.iterSearch(payload))
 
 
 class LocalBacklogFactory:
@@ -549,55 +528,37 @@ class LocalBacklogFactory:
         return cls.instance
 
     def __init__(self):
-        self.trackersData = dict()
-        for trackername in trackersBook:
-            trackerkey = trackersBook[trackername].key
-            self.trackersData[trackerkey] = self.load(trackername)
-            self.clean(trackername)
+        self.engine = DataEngine(settings.storeHome)
+        self.partitions = dict()
+        # trackers are loaded when a backlog needs them
+        self.trackersData = TrackersData(settings.storeHome, settings.store['trackers'], self._load)
 
-    def getCoordinationBacklog(self, chaptername):
-        cmp = trackersBookByName[chaptername].coordination
-        trackerData, timestamp = self.trackersData[cmp.tracker]
-        data = list()
-        for item in trackerData:
-            try:
-                _id = item['fields']['components'][0]['id']
-            except Exception:
-                continue
+    def _load(self, trackerkey):
+        trackername = trackersBookByKey[trackerkey].name
+        self.clean(trackername)
+        return self.load(trackername)
 
-            if cmp.key == _id:
-                data.append(item)
+    def _componentData(self, cmp):
+        # the sqlite store finds the component issues through its index
+        if settings.store['backend'] == 'sqlite':
+            return self.engine.getTrackerComponentData(cmp.tracker, cmp.key)
 
-        return Backlog.fromData(data, timestamp)
+        trackerData, timestamp = self.trackersData[cmp.tracker]
+        if cmp.tracker not in self.partitions:
+            self.partitions[cmp.tracker] = self.engine.getTrackerPartition(cmp.tracker, trackerData, timestamp)
+        return [trackerData[position] for position in self.partitions[cmp.tracker].get(cmp.key, ())], timestamp
+
+    def getCoordinationBacklog(self, chaptername):
+        cmp = trackersBookByName[chaptername].coordination
+        return Backlog.fromData(*self._componentData(cmp))
 
     def getEnablerBacklog(self, enablername):
         enabler = enablersBook[enablername]
-        trackerData, timestamp = self.trackersData[enabler.tracker]
-        data = list()
-        for item in trackerData:
-            try:
-                _id = item['fields']['components'][0]['id']
-            except Exception:
-                continue
-
-            if enabler.key == _id: data.append(item)
-
-        return Backlog.fromData(data, timestamp)
+        return Backlog.fromData(*self._componentData(enabler))
 
     def getToolBacklog(self, toolname):
         tool = toolsBook[toolname]
-        trackerData, timestamp = self.trackersData[tool.tracker]
-        data = list()
-        for item in trackerData:
-            try:
-                _id = item['fields']['components'][0]['id']
-            except Exception:
-                continue
-
-            if tool.key == _id:
-                data.append(item)
-
-        return Backlog.fromData(data, timestamp)
+        return Backlog.fromData(*self._componentData(tool))
 
     def load(self, trackername):
         # fileList = os.listdir(settings.storeHome)
@@ -628,20 +589,10 @@ class LocalBacklogFactory:
 
 
     def clean(self, tracker):
-        fileList = os.listdir(settings.storeHome)
-        mfilter = re.compile(r'\bFIWARE\.tracker\.(?P<tracker>[\w\-]+)\.(?P<day>\d{8})[-](?P<hour>\d{4})\.pkl\b')
-        record = namedtuple('record', 'filename, tracker, day, hour')
-        filelist = [record(mfilter.match(f).group(0),
-                           mfilter.match(f).group('tracker'),
-                           mfilter.match(f).group('day'),
-                           mfilter.match(f).group('hour')) for f in fileList if mfilter.match(f)
-                    if mfilter.match(f).group('tracker') == tracker]
-        filelist.sort(key=attrgetter('day', 'hour'), reverse=True)
-        toRemove = filelist[5:]
-        if len(toRemove) > 0:
-            for item in toRemove:
-                os.remove(os.path.join(settings.storeHome, item.filename))
-
+        manifest = Manifest.getInstance(settings.storeHome)
+        manifest.adopt('tracker',
+                       r'\bFIWARE\.tracker\.(?P<name>[\w\-]+)\.(?P<day>\d{8})[-](?P<time>\d{4})\.pkl\b')
+        manifest.retain('tracker', tracker, 5)
 
 if __name__ == "__main__":
     pass
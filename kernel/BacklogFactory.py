@@ -6,6 +6,7 @@ from collections import namedtuple
 from kernel.TrackerBook import trackersBook, chaptersBook, labsBook
 from kernel.ComponentsBook import enablersBook, coordinationBook, toolsBook, tComponentsBook
 from kernel.Backlog import Backlog
+from kernel.DataFactory import DataEngine, TrackersData
 from kernel.Settings import settings
 
 
@@ -18,38 +19,23 @@ class BacklogFactory:
         return cls._singlenton
 
     def __init__(self):
-        self.trackersData = dict()
-        for trackername in trackersBook:
-            tracker = trackersBook[trackername]
-            self.trackersData[tracker.key] = self.__load(trackername)
-
-    def _load(self, trackername):
-        fileList = os.listdir(settings.storeHome)
-        mfilter = re.compile(r'\bFIWARE\.tracker\.(?P<tracker>[\w\-]+)\.(?P<day>\d{8})[-](?P<hour>\d{4})\.pkl\b')
-        record = namedtuple('record', 'tracker, filename, day, time')
-        files = [record(mfilter.match(f).group('tracker'),
-                                   mfilter.match(f).group(0),
-                                   mfilter.match(f).group('day'),
-                                   mfilter.match(f).group('hour'))
-                            for f in fileList if mfilter.match(f) if mfilter.match(f).group('tracker') == trackername]
-
-        # print(files)
-        files.sort(key=lambda e: (e.day, e.time), reverse=True)
-        filename = files[0].filename
-        _timestamp = '{}-{}'.format(files[0].day, files[0].time)
-        timestamp = datetime.strptime(_timestamp, '%Y%m%d-%H%M').strftime("%Y%m%d-%H:%M")
-        # print(timestamp)
-
-        with open(os.path.join(settings.storeHome, filename), 'rb') as f:
-            data = pickle.load(f)
-
-        return data, timestamp
-
-    def __load(self, trackername):
-        filename = 'FIWARE.Engine.Tracker.{}.pkl'.format(trackername)
-        with open(os.path.join(settings.storeHome, filename), 'rb') as f:
-            timestamp, data= pickle.load(f)
-        return data, timestamp
+        # it's a singleton: trackers already loaded are kept among calls
+        if hasattr(self, 'trackersData'):
+            return
+        self.engine = DataEngine(settings.storeHome)
+        self.partitions = dict()
+        # trackers are loaded when a backlog needs them
+        self.trackersData = TrackersData(settings.storeHome, settings.store['trackers'])
+
+    def _componentData(self, cmp):
+        # the sqlite store finds the component issues through its index
+        if settings.store['backend'] == 'sqlite':
+            return self.engine.getTrackerComponentData(cmp.tracker, cmp.key)
+
+        trackerData, timestamp = self.trackersData[cmp.tracker]
+        if cmp.tracker not in self.partitions:
+            self.partitions[cmp.tracker] = self.engine.getTrackerPartition(cmp.tracker, trackerData, timestamp)
+        return [trackerData[position] for position in self.partitions[cmp.tracker].get(cmp.key, ())], timestamp
 
     def getChapterBacklog(self, chaptername):
         trackerkey = trackersBook[chaptername].keystone
@@ -63,42 +49,19 @@ class BacklogFactory:
     def getEnablerBacklog(self, enablername):
         start_time = time.time()
         enabler = enablersBook[enablername]
-        trackerData, timestamp = self.trackersData[enabler.tracker]
-        data = list()
-        for item in trackerData:
-            try:key = item['fields']['components'][0]['id']
-            except Exception: continue
-            if enabler.key == key: data.append(item)
-        backlog = Backlog.fromData(data, timestamp)
+        backlog = Backlog.fromData(*self._componentData(enabler))
         #print('{}-{}: time = {}'.format(enablername, enablersBook[enablername].chapter, time.time() - start_time))
         return backlog
 
     def getToolBacklog(self, toolname):
         tool = toolsBook[toolname]
-        trackerData, timestamp = self.trackersData[tool.tracker]
-        data = list()
-        for item in trackerData:
-            try:key = item['fields']['components'][0]['id']
-            except Exception: continue
-            if tool.key == key: data.append(item)
-        backlog = Backlog.fromData(data, timestamp)
+        backlog = Backlog.fromData(*self._componentData(tool))
         #print('{}-{}: time = {}'.format(enablername, enablersBook[enablername].chapter, time.time() - start_time))
         return backlog
 
     def getCoordinationBacklog(self, coordinationkey):
         coordination = coordinationBook[coordinationkey]
-        trackerData, timestamp = self.trackersData[coordination.tracker]
-        data = list()
-        for item in trackerData:
-            try:
-                key = item['fields']['components'][0]['id']
-            except Exception:
-                continue
-
-            if coordination.key == key:
-                data.append(item)
-
-        backlog = Backlog.fromData(data, timestamp)
+        backlog = Backlog.fromData(*self._componentData(coordination))
 
         return backlog
 
@@ -87,6 +87,7 @@ class Calendar(OrderedDict):
 calendar = Calendar()
 
 AgileCalendarEntry = namedtuple('AgileCalendarEntry', 'month, sprint, release')
+TimeSlots = namedtuple('TimeSlots', 'past, current, future')
 
 
 class AgileCalendar(OrderedDict):
@@ -111,6 +112,10 @@ class AgileCalendar(OrderedDict):
         self.Sprints = ['Sprint {}'.format(sprint) for sprint in self.sprints]
         self.Releases = ['Release {}'.format(release) for release in self.releases]
 
+        # time slots and frames by reference date, kept for the day they were computed
+        self._slots = dict()
+        self._today = None
+
     #@property
     #def currentTimeSlots(self):
     #    month = self.calendar.currentMonth[1]
@@ -128,9 +133,8 @@ class AgileCalendar(OrderedDict):
         release = [self[month_id].release]
         return release + sprint
 
-    @property
-    def pastTimeSlots(self):
-        month = self.calendar.currentMonth()[1]
+    def _pastTimeSlots(self, current_date=None):
+        month = self.calendar.currentMonth(current_date=current_date)[1]
 
         i = self.calendar.months.index(month) - 1
         sprints = [sprint for sprint in self.sprints[:i] if sprint != self.sprints[i]]
@@ -138,15 +142,47 @@ class AgileCalendar(OrderedDict):
         releases = [key for key, _ in groupby(_releases)]
         return releases + sprints
 
-    @property
-    def futureTimeSlots(self):
-        month = self.calendar.currentMonth()[1]
+    def _futureTimeSlots(self, current_date=None):
+        month = self.calendar.currentMonth(current_date=current_date)[1]
         i = self.calendar.months.index(month) - 1
         sprints = [sprint for sprint in self.sprints[i:] if sprint != self.sprints[i]]
         _releases = [release for release in self.releases[i:] if release != self.releases[i]]
         releases = [key for key, _ in groupby(_releases)]
         return releases + sprints
 
+    @property
+    def pastTimeSlots(self):
+        return self._pastTimeSlots()
+
+    @property
+    def futureTimeSlots(self):
+        return self._futureTimeSlots()
+
+    def _classify(self, current_date):
+        today = date.today()
+        if today != self._today or len(self._slots) > 8:
+            self._slots, self._today = dict(), today
+        current_date = current_date if current_date else today
+        if current_date not in self._slots:
+            slots = TimeSlots(frozenset(self._pastTimeSlots(current_date)),
+                              frozenset(self.currentTimeSlots(current_date)),
+                              frozenset(self._futureTimeSlots(current_date)))
+            # past slots before current ones before future ones, as the frames were always checked
+            frames = {'Unscheduled': 'Foreseen'}
+            for frame, _slots in (('Foreseen', slots.future), ('Working On', slots.current),
+                                  ('Implemented', slots.past)):
+                frames.update(dict.fromkeys(_slots, frame))
+            self._slots[current_date] = slots, frames
+        return self._slots[current_date]
+
+    def timeSlots(self, current_date=None):
+        # past, current and future sprints and releases as sets
+        return self._classify(current_date)[0]
+
+    def frameOf(self, timeSlot, current_date=None):
+        # 'Implemented', 'Working On', 'Foreseen' or 'Unknown' for a sprint or release number or 'Unscheduled'
+        return self._classify(current_date)[1].get(timeSlot, 'Unknown')
+
     @property
     def nextSprint(self):
         _month = self.calendar.currentMonth[1]
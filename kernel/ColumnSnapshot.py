@@ -0,0 +1,231 @@
+import os
+import mmap
+import pickle
+import struct
+from array import array
+from datetime import date
+from collections.abc import Sequence
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class ColumnSnapshot(Sequence):
+    """
+    Read-only snapshot of a list of issues laid out by columns, opened with mmap so that the
+    report processes reading the same file share one copy of it through the page cache:
+        header:  magic, timestamp, number of issues, number of strings
+        strings: offsets and utf-8 bytes of every distinct string
+        columns: one int32 array per column - string number (-1: none) or date ordinal (0: none)
+        rows:    offsets and pickled issues, decoded one at a time when they are asked for
+    Arrays are in the byte order of the host writing the file, the one reading it.
+    Only the selection is columnar: where(), codes() and column() read the columns, but every issue
+    selected is unpickled whole from its row, whichever of its fields the reader goes on to use.
+    """
+    magic = b'FWCOLS01'
+    _header = struct.Struct('>8s16sII')
+
+    strings = {'key': ('key',),
+               'project': ('fields', 'project', 'key'),
+               'component': ('fields', 'components', 0, 'id'),
+               'issuetype': ('fields', 'issuetype', 'name'),
+               'status': ('fields', 'status', 'name'),
+               'resolution': ('fields', 'resolution', 'name'),
+               'fixVersion': ('fields', 'fixVersions', 0, 'name'),
+               'customfield_11103': ('fields', 'customfield_11103', 'value'),
+               'customfield_11104': ('fields', 'customfield_11104', 'value'),
+               'customfield_11105': ('fields', 'customfield_11105', 'value')}
+    dates = {'created': ('fields', 'created'),
+             'updated': ('fields', 'updated'),
+             'resolutiondate': ('fields', 'resolutiondate')}
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._map = None
+
+    @staticmethod
+    def _value(issue, path):
+        try:
+            item = issue
+            for step in path:
+                item = item[step]
+            return item
+        except Exception:
+            return None
+
+    @staticmethod
+    def _pad(f):
+        f.write(b'\0' * (-f.tell() % 8))
+
+    def write(self, timestamp, issues):
+        codes, strings = dict(), list()
+        columns = {name: array('i') for name in list(ColumnSnapshot.strings) + list(ColumnSnapshot.dates)}
+        rows, offsets = list(), array('Q', [0])
+
+        for issue in issues:
+            for name, path in ColumnSnapshot.strings.items():
+                value = ColumnSnapshot._value(issue, path)
+                if value is None:
+                    columns[name].append(-1)
+                    continue
+                if value not in codes:
+                    codes[value] = len(strings)
+                    strings.append(value)
+                columns[name].append(codes[value])
+            for name, path in ColumnSnapshot.dates.items():
+                value = ColumnSnapshot._value(issue, path)
+                columns[name].append(date(*map(int, value[:10].split('-'))).toordinal() if value else 0)
+            row = pickle.dumps(issue, pickle.HIGHEST_PROTOCOL)
+            rows.append(row)
+            offsets.append(offsets[-1] + len(row))
+
+        blob = [string.encode('utf-8') for string in strings]
+        stringOffsets = array('Q', [0])
+        for item in blob:
+            stringOffsets.append(stringOffsets[-1] + len(item))
+
+        tmpfile = '{}.tmp'.format(self.filename)
+        with open(tmpfile, 'wb') as f:
+            f.write(ColumnSnapshot._header.pack(ColumnSnapshot.magic, timestamp.encode('ascii'),
+                                                len(offsets) - 1, len(strings)))
+            self._pad(f)
+            stringOffsets.tofile(f)
+            f.write(b''.join(blob))
+            self._pad(f)
+            for name in list(ColumnSnapshot.strings) + list(ColumnSnapshot.dates):
+                columns[name].tofile(f)
+                self._pad(f)
+            offsets.tofile(f)
+            for row in rows:
+                f.write(row)
+        os.replace(tmpfile, self.filename)
+        return len(offsets) - 1
+
+    def _readHeader(self, buffer):
+        magic, timestamp, count, nstrings = ColumnSnapshot._header.unpack_from(buffer)
+        if magic != ColumnSnapshot.magic:
+            raise ValueError('{} is not a column snapshot file'.format(self.filename))
+        return timestamp.rstrip(b'\0').decode('ascii'), count, nstrings
+
+    def header(self):
+        # (timestamp, count) without mapping the file
+        with open(self.filename, 'rb') as f:
+            timestamp, count, nstrings = self._readHeader(f.read(ColumnSnapshot._header.size))
+        return timestamp, count
+
+    def _open(self):
+        if self._map is not None:
+            return
+        with open(self.filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        self.timestamp, self.count, nstrings = self._readHeader(view)
+
+        def section(offset, length, fmt=None):
+            part = view[offset:offset + length]
+            return (part.cast(fmt) if fmt else part), offset + length + (-(offset + length) % 8)
+
+        offset = ColumnSnapshot._header.size + (-ColumnSnapshot._header.size % 8)
+        self._stringOffsets, offset = section(offset, 8 * (nstrings + 1), 'Q')
+        self._stringBlob, offset = section(offset, self._stringOffsets[-1])
+        self._columns = dict()
+        for name in list(ColumnSnapshot.strings) + list(ColumnSnapshot.dates):
+            self._columns[name], offset = section(offset, 4 * self.count, 'i')
+        self._rowOffsets, _offset = section(offset, 8 * (self.count + 1), 'Q')
+        self._rows = view[offset + 8 * (self.count + 1):]
+        self._strings = dict()
+        self._codes = None
+
+    def string(self, code):
+        if code < 0:
+            return None
+        if code not in self._strings:
+            self._strings[code] = bytes(self._stringBlob[self._stringOffsets[code]:self._stringOffsets[code + 1]])\
+                .decode('utf-8')
+        return self._strings[code]
+
+    def code(self, value):
+        # number of a string in the table, -1 if it is not there
+        self._open()
+        if self._codes is None:
+            self._codes = {self.string(code): code for code in range(len(self._stringOffsets) - 1)}
+        return self._codes.get(value, -1)
+
+    def codes(self, name):
+        # the raw int32 column, no python object per issue
+        self._open()
+        return self._columns[name]
+
+    def column(self, name):
+        codes = self.codes(name)
+        if name in ColumnSnapshot.dates:
+            return [date.fromordinal(code) if code else None for code in codes]
+        return [self.string(code) for code in codes]
+
+    def where(self, **values):
+        # positions of the issues matching all the values given: a value, or several of them for
+        # string columns; for date columns a tuple (since, until) as in IssueStore, both optional
+        self._open()
+        positions = range(self.count)
+        for name, value in values.items():
+            codes = self._columns[name]
+            if name in ColumnSnapshot.dates:
+                since, until = value if isinstance(value, tuple) else (value, value)
+                since = date(*map(int, since.split('-'))).toordinal() if since else 1
+                until = date(*map(int, until.split('-'))).toordinal() if until else date.max.toordinal()
+                positions = [n for n in positions if codes[n] and since <= codes[n] <= until]
+            else:
+                wanted = {self.code(item) for item in value} if isinstance(value, (tuple, list, set, frozenset)) \
+                    else {self.code(value)}
+                wanted.discard(-1)
+                positions = [n for n in positions if codes[n] in wanted]
+        return list(positions)
+
+    def rows(self, positions):
+        # whole issues, from their pickled rows
+        return _Rows(self, positions)
+
+    def __len__(self):
+        self._open()
+        return self.count
+
+    def __getitem__(self, position):
+        self._open()
+        if isinstance(position, slice):
+            return [self[n] for n in range(*position.indices(self.count))]
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+        return pickle.loads(self._rows[self._rowOffsets[position]:self._rowOffsets[position + 1]])
+
+    def __iter__(self):
+        self._open()
+        for position in range(self.count):
+            yield self[position]
+
+    def load(self):
+        self._open()
+        return self, self.timestamp
+
+
+class _Rows(Sequence):
+    # issues of a column snapshot at the given positions, decoded when they are read
+    def __init__(self, snapshot, positions):
+        self.snapshot = snapshot
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self.snapshot[position] for position in self.positions[n]]
+        return self.snapshot[self.positions[n]]
+
+    def __iter__(self):
+        for position in self.positions:
+            yield self.snapshot[position]
+
+
+if __name__ == "__main__":
+    pass
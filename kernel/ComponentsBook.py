@@ -3,66 +3,40 @@ __author__ = "Manuel Escriche <mev@tid.es>"
 import os, re, pickle
 from datetime import date, datetime
 from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from operator import attrgetter
 from xml.etree import ElementTree as ET
 from kernel.Settings import settings
 from kernel.Connector import Connector
+from kernel.NamesCache import NamesCache
+from kernel.Manifest import Manifest
 
 
 class ComponentLeaders(dict):
-    def __init__(self):
+    """
+    Leaders of the components in the site books, kept in a single persistent cache (kernel.NamesCache).
+    Building it refreshes the expired and missing entries only, all of them at the same time;
+    leaders not found are cached as 'Unknown' for the same ttl, and an entry that cannot be
+    refreshed keeps its cached leader. fromFile() reads the cache without going to JIRA.
+    """
+    books = (('Enablers.xml', 'enabler'), ('Tools.xml', 'tool'), ('Coordination.xml', 'coordinator'),
+             ('WorkGroups.xml', 'group'), ('HelpdeskChannels.xml', 'channel'), ('AccountsChannels.xml', 'channel'),
+             ('LabNodes.xml', 'component'), ('LabNodes.xml', 'node'))
+
+    def __init__(self, refresh=True):
         super().__init__()
-        self.timestamp = datetime.now().strftime("%Y%m%d-%H%M")
-        self.filename = 'FIWARE.components.leaders' +'.'+ self.timestamp + '.pkl'
         codeHome = os.path.dirname(os.path.abspath(__file__))
         configHome = os.path.join(os.path.split(codeHome)[0], 'site_config')
 
-        xmlfile = os.path.join(configHome, 'Enablers.xml')
-        #print(xmlfile)
-        tree = ET.parse(xmlfile)
-        root = tree.getroot()
-        for item in root.findall('enabler'):
-            key = item.find('cmp_key').text
-            try:
-                self[key] = self.find_leader(key)
-            except Exception:
-                raise Exception
-
-        xmlfile = os.path.join(configHome, 'Tools.xml')
-        #print(xmlfile)
-        tree = ET.parse(xmlfile)
-        root = tree.getroot()
-        for item in root.findall('tool'):
-            key = item.find('cmp_key').text
-            try:
-                self[key] = self.find_leader(key)
-            except Exception:
-                raise Exception
-
-        xmlfile = os.path.join(configHome, 'Coordination.xml')
-        #print(xmlfile)
-        tree = ET.parse(xmlfile)
-        root = tree.getroot()
-        for item in root.findall('coordinator'):
-            key = item.find('cmp_key').text
-            try:
-                self[key] = self.find_leader(key)
-            except Exception:
-                raise Exception
-
-        xmlfile = os.path.join(configHome, 'WorkGroups.xml')
-        #print(xmlfile)
-        tree = ET.parse(xmlfile)
-        root = tree.getroot()
-        for item in root.findall('group'):
-            key = item.find('cmp_key').text
-            try:
-                self[key] = self.find_leader(key)
-            except Exception:
-                raise Exception
+        self.cmpKeys = list()
+        for xmlfile, tag in ComponentLeaders.books:
+            root = ET.parse(os.path.join(configHome, xmlfile)).getroot()
+            self.cmpKeys.extend(item.find('cmp_key').text for item in root.findall(tag))
 
-        self.save()
-        self.clean()
+        self.cache = NamesCache('componentLeaders')
+        if refresh:
+            self.refresh()
+        self.update({key: self.cache.get(key, 'Unknown') for key in self.cmpKeys})
 
     def find_leader(self, key):
         try:
@@ -72,38 +46,45 @@ class ComponentLeaders(dict):
             leader = 'Unknown'
         return leader
 
-    def save(self):
-        #print(self)
-        longFilename = os.path.join(settings.storeHome, self.filename)
-        with open(longFilename, 'wb') as f:
-            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+    def refresh(self):
+        pending = self.cache.expired(self.cmpKeys)
+        if not pending or settings.cache['offline'] == 'yes':
+            return
+        try:
+            Connector.getInstance()
+        except Exception:
+            # JIRA can't be reached: the cached leaders are kept
+            return
+        with ThreadPoolExecutor(max_workers=settings.http['workers']) as executor:
+            leaders = dict(zip(pending, executor.map(self.find_leader, pending)))
+        # not found: the cached leader, if any, or 'Unknown', both kept until they expire again
+        self.cache.update({key: leaders[key] if leaders[key] != 'Unknown' else self.cache.get(key, 'Unknown')
+                           for key in leaders})
+        self.cache.save()
+        self.update({key: self.cache.get(key, 'Unknown') for key in self.cmpKeys})
 
     @classmethod
     def fromFile(cls):
-        fileList = os.listdir(settings.storeHome)
-        mfilter = re.compile(r'\bFIWARE\.components\.leaders\.(?P<day>\d{8})[-](?P<time>\d{4})[.]pkl\b')
-        record = namedtuple('record', 'filename, day, time')
-        filelist = [record(mfilter.match(f).group(0),
-                           mfilter.match(f).group('day'),
-                           mfilter.match(f).group('time')) for f in fileList if mfilter.match(f)]
-        filelist.sort(key=attrgetter('day', 'time'), reverse=True)
-        filename = filelist[0].filename
-        #print('load-fromFile', filename)
+        leaders = cls(refresh=False)
+        if not any(key in leaders.cache for key in leaders.cmpKeys):
+            # first run: seed the cache from the latest pickled leaders file, if any
+            try:
+                legacy = cls._legacyFile()
+            except Exception:
+                legacy = dict()
+            if legacy:
+                leaders.cache.update(legacy)
+                leaders.cache.save()
+                leaders.update({key: leaders.cache.get(key, 'Unknown') for key in leaders.cmpKeys})
+        return leaders
+
+    @staticmethod
+    def _legacyFile():
+        manifest = Manifest.getInstance(settings.storeHome)
+        manifest.adopt('componentLeaders', r'\bFIWARE\.components\.leaders\.(?P<day>\d{8})[-](?P<time>\d{4})[.]pkl\b')
+        filename = manifest.latest('componentLeaders')
         with open(os.path.join(settings.storeHome, filename), 'rb') as f:
-            return pickle.load(f)
-
-    def clean(self):
-        fileList = os.listdir(settings.storeHome)
-        mfilter = re.compile(r'\bFIWARE\.components\.leaders\.(?P<day>\d{8})[-](?P<time>\d{4})[.]pkl\b')
-        record = namedtuple('record', 'filename, day, time')
-        filelist = [record(mfilter.match(f).group(0),
-                           mfilter.match(f).group('day'),
-                           mfilter.match(f).group('time')) for f in fileList if mfilter.match(f)]
-        filelist.sort(key=attrgetter('day', 'time'), reverse=True)
-        toRemove = filelist[5:]
-        if len(toRemove) > 0:
-            for item in toRemove:
-                os.remove(os.path.join(settings.storeHome, item.filename))
+            return dict(pickle.load(f))
 
 
 class Component:
@@ -114,19 +95,9 @@ class Component:
         self.name = comp.get('name')
         self._leader = leader
 
-    def find_leader(self):
-        try:
-            jiraConnector = Connector.getInstance()
-            data = jiraConnector.component(self.key)
-            leader = data['realAssignee']['displayName']
-        except Exception:
-            leader = 'Unknown'
-        return leader
-
     @property
     def leader(self):
-        if self._leader == 'Unknown':
-            self._leader = self.find_leader()
+        # taken from the leaders cache, refreshed by ComponentsBook.refreshLeaders()
         return self._leader
 
     def __repr__(self):
@@ -257,6 +228,16 @@ class ComponentsBook(OrderedDict):
         self.labNodesByKey = OrderedDict((cmp, self[cmp]) for cmp in self if type(self[cmp]) == LabNode)
         self.labNodesByName = OrderedDict((self[cmp].name, self[cmp]) for cmp in self if type(self[cmp]) == LabNode)
 
+    def refreshLeaders(self):
+        # expired or missing leaders are looked up in JIRA, unless working offline
+        try:
+            leaders = self.leaders
+        except AttributeError:
+            leaders = self.leaders = ComponentLeaders(refresh=False)
+        leaders.refresh()
+        for key in self:
+            self[key]._leader = leaders.get(key, 'Unknown')
+
     def add_enablers(self):
         xmlfile = os.path.join(self.configHome, 'Enablers.xml')
         #print(xmlfile)
@@ -387,4 +368,5 @@ labNodesBook = tComponentsBook.labNodesByName
 
 
 if __name__ == "__main__":
-    pass
+    # refresh the expired component leaders
+    tComponentsBook.refreshLeaders()
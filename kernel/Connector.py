@@ -1,11 +1,9 @@
 __author__ = "Manuel Escriche <mev@tid.es>"
 
-import base64, certifi, requests
+import certifi
 from kernel.Settings import settings
-
-
-class ConnectionToJIRA(Exception):
-    pass
+from kernel.JiraClient import JiraClient, ConnectionToJIRA, iterIssues
+from kernel.HttpCache import HttpCache
 
 
 class Connector:
@@ -32,74 +30,61 @@ class Connector:
         self._connect()
 
     def _connect(self):
-        username = settings.server['JIRA'].username
-        password = settings.server['JIRA'].password
-        auth = '{}:{}'.format(username, password)
-        keyword = base64.b64encode(bytes(auth, 'utf-8'))
-        access_key = str(keyword)[2:-1]
-        headers = {'Content-Type': 'application/json', "Authorization": "Basic {}".format(access_key)}
-        self.root_url = 'https://{}'.format(settings.server['JIRA'].domain)
-        # print(self.root_url)
-        self.session = requests.session()
-
-        # url = '{}{}'.format(self.root_url, Connector.url_api['session'])
-        answer = self.session.get(self.root_url, headers=headers, verify=Connector.verify)
-        if answer.status_code != requests.codes.ok:
-            raise ConnectionToJIRA
+        self.client = JiraClient.getInstance()
+        self.root_url = self.client.root_url
+        self.session = self.client.session
+        # metadata (components, projects, users) rarely changes: it's served from the http cache
+        self.cache = HttpCache.getInstance()
 
-        self.session.headers.update({'Content-Type': 'application/json'})
+    def _cached(self, url, params=None):
+        return self.cache.get(self.session, url, params=params, verify=Connector.verify)
 
     def component(self, cmp_id):
         # print('component')
         url = '{}{}{}'.format(self.root_url, Connector.url_api['component'], cmp_id)
         try:
-            answer = self.session.get(url, verify=Connector.verify)
+            data = self._cached(url)
         except Exception:
             try:
-                self._connect()
-                answer = self.session.get(url, verify=Connector.verify)
+                self.client.login()
+                data = self._cached(url)
             except Exception:
                 raise ConnectionToJIRA
 
-        data = answer.json()
         return data
 
     def componentLeader(self, cmp_id):
         url = '{}{}{}'.format(self.root_url, Connector.url_api['component'], cmp_id)
         try:
-            answer = self.session.get(url, verify=Connector.verify)
+            data = self._cached(url)
         except Exception:
             return 'Unknown'
 
-        data = answer.json()
         return data['realAssignee']['displayName']
 
     def tracker(self, tracker_id):
         #print('tracker')
         url = '{}{}{}'.format(self.root_url, Connector.url_api['project'], tracker_id)
         try:
-            answer = self.session.get(url, verify=Connector.verify)
+            data = self._cached(url)
         except Exception:
             try:
-                self._connect()
-                answer = self.session.get(url, verify=Connector.verify)
+                self.client.login()
+                data = self._cached(url)
             except Exception:
                 raise ConnectionToJIRA
-        #print(answer.url)
-        data = answer.json()
         return data
 
     def trackerLeader(self, tracker_id):
         url = '{}{}/{}?lead'.format(self.root_url, Connector.url_api['project'], tracker_id)
         try:
-            answer = self.session.get(url, verify=Connector.verify)
+            data = self._cached(url)
         except Exception:
             try:
-                self._connect()
-                answer = self.session.get(url, verify=Connector.verify)
+                self.client.login()
+                data = self._cached(url)
             except Exception:
                 raise ConnectionToJIRA
-        data = answer.json()
         return data['lead']['displayName']
 
     def search(self, params):
@@ -110,7 +95,7 @@ class Connector:
             answer = self.session.get(url, params=params, verify=Connector.verify)
         except Exception:
             try:
-                self._connect()
+                self.client.login()
                 answer = self.session.get(url, params=params, verify=Connector.verify)
             except Exception:
                 raise ConnectionToJIRA
@@ -118,17 +103,18 @@ class Connector:
         data = answer.json()
         return data
 
+    def iterSearch(self, params):
+        return iterIssues(self.search, params, settings.http['workers'])
+
     def displayName(self, username):
         url = '{}{}'.format(self.root_url, Connector.url_api['user'])
         params = {'username': username }
         for n in range(0,1):
             try:
-                answer = self.session.get(url, params=params, verify=Connector.verify)
+                data = self._cached(url, params=params)
             except Exception:
                 if n: raise ConnectionToJIRA
             else: break
-        #print(answer.url)
-        data = answer.json()
         return data['displayName']
 
 class JIRA:
@@ -144,22 +130,9 @@ class JIRA:
     }
 
     def __init__(self):
-        username = settings.server['JIRA'].username
-        password = settings.server['JIRA'].password
-        auth = '{}:{}'.format(username, password)
-        keyword = base64.b64encode(bytes(auth, 'utf-8'))
-        access_key = str(keyword)[2:-1]
-        headers = {'Content-Type': 'application/json', "Authorization": "Basic {}".format(access_key)}
-        self.root_url = 'https://{}'.format(settings.server['JIRA'].domain)
-        # print(self.root_url)
-        self.session = requests.session()
-
-        # url = '{}{}'.format(self.root_url, JIRA.url_api['session'])
-        answer = self.session.get(self.root_url, headers=headers, verify=JIRA.verify)
-        if answer.status_code != requests.codes.ok:
-            raise ConnectionToJIRA
-
-        self.session.headers.update({'Content-Type': 'application/json'})
+        self.client = JiraClient.getInstance()
+        self.root_url = self.client.root_url
+        self.session = self.client.session
 
     def search(self, params):
         url = '{}{}'.format(self.root_url, JIRA.url_api['search'])
@@ -1,11 +1,21 @@
 import os
 import pickle
+import threading
 import base64
 import requests
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from collections import OrderedDict
 from kernel.TrackerBook import trackersBook, trackersBookByKey
 from kernel.ComponentsBook import tComponentsBook
 from kernel.Jira import JIRA
+from kernel.IssueStore import IssueStore
+from kernel.History import History
+from kernel.SnapshotFile import SnapshotFile
+from kernel.ColumnSnapshot import ColumnSnapshot
+from kernel.Ingest import Ingest
+from kernel.DateParser import jiraDateTime
+from kernel.Settings import settings
 
 __author__ = "Manuel Escriche <mev@tid.es>"
 
@@ -16,28 +26,119 @@ class DataEngine:
             self.storage = storage
             self.name = name
 
-        def save(self, data):
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M")
-            filename = 'FIWARE.Engine.{}.{}.pkl'.format(self._type, self.name)
-            longFilename = os.path.join(self.storage, filename)
+        @property
+        def store(self):
+            # sqlite backend, None when data is kept in snapshot files
+            return IssueStore.getInstance(self.storage) if settings.store['backend'] == 'sqlite' else None
+
+        def save(self, data, timestamp=None):
+            timestamp = timestamp if timestamp else datetime.now().strftime("%Y%m%d-%H%M")
+            # data may also come as a stream of issues straight from JIRA; issues are stored pruned
+            # to what the kernel reads, one at a time, and recorded as they are written
+            recorders = self._recorders(timestamp)
+            data = DataEngine.recorded(map(Ingest(), data), recorders)
+            try:
+                if self.store:
+                    filename = self.store.save(self._type, self.name, data, timestamp)
+                else:
+                    filename = 'FIWARE.Engine.{}.{}.snap'.format(self._type, self.name)
+                    SnapshotFile(os.path.join(self.storage, filename)).write(timestamp, data)
+            except Exception:
+                for recorder in recorders:
+                    recorder.abort()
+                raise
+            for recorder in recorders:
+                recorder.close()
+
+            if not self.store:
+                if settings.store['columnar'] == 'yes':
+                    # columns are written from the snapshot just saved, read back one issue at a time
+                    self._columns.write(timestamp, map(Ingest(), self._snapshot))
 
-            with open(longFilename, 'wb') as f:
-                pickle.dump((timestamp, data), f, pickle.HIGHEST_PROTOCOL)
+                # the former pickle of this object, if any, is superseded
+                legacy = os.path.join(self.storage, 'FIWARE.Engine.{}.{}.pkl'.format(self._type, self.name))
+                if os.path.exists(legacy):
+                    os.remove(legacy)
 
+            self._saved(timestamp)
             return filename
 
-        def load(self):
+        def _recorders(self, timestamp):
+            # those given every issue saved: add(issue), then close() once saved or abort()
+            return []
+
+        def _saved(self, timestamp):
+            pass
+
+        @property
+        def _snapshot(self):
+            return SnapshotFile(os.path.join(self.storage, 'FIWARE.Engine.{}.{}.snap'.format(self._type, self.name)))
+
+        @property
+        def _columns(self):
+            return ColumnSnapshot(os.path.join(self.storage, 'FIWARE.Engine.{}.{}.cols'.format(self._type, self.name)))
+
+        def _legacyLoad(self):
             filename = 'FIWARE.Engine.{}.{}.pkl'.format(self._type, self.name)
+            with open(os.path.join(self.storage, filename), 'rb') as f:
+                timestamp, data = pickle.load(f)
+            return data, timestamp
+
+        def load(self):
+            if self.store:
+                return self.store.load(self._type, self.name)
 
             try:
-                f = open(os.path.join(self.storage, filename), 'rb')
-                timestamp, data = pickle.load(f)
+                timestamp, count = self._snapshot.header()
             except FileNotFoundError:
-                raise
-            else:
-                f.close()
+                return self._legacyLoad()
+            # records equal among issues are shared again once decoded
+            return Ingest().all(self._snapshot), timestamp
 
-            return data, timestamp
+        def view(self):
+            # (issues, timestamp) for readers: the column snapshot, mapped and decoded row by row,
+            # when there is one as recent as the data; the data loaded otherwise
+            if self.store:
+                return self.load()
+
+            try:
+                columns = self._columns
+                if columns.header() == self.header():
+                    return columns.load()
+            except (FileNotFoundError, ValueError):
+                pass
+            return self.load()
+
+        def header(self):
+            # (timestamp, number of issues) without reading the issues
+            if self.store:
+                return self.store.header(self._type, self.name)
+
+            try:
+                return self._snapshot.header()
+            except FileNotFoundError:
+                data, timestamp = self._legacyLoad()
+                return timestamp, len(data)
+
+        def stream(self):
+            # (issues, timestamp) with issues read one at a time, shared as load() does
+            if self.store:
+                return self.store.load(self._type, self.name)
+
+            try:
+                timestamp, count = self._snapshot.header()
+            except FileNotFoundError:
+                return self._legacyLoad()
+            return map(Ingest(), self._snapshot), timestamp
+
+        def select(self, **where):
+            # issues matching the given IssueStore columns: an index seek with sqlite, otherwise a scan
+            # of the stream in which only the matching issues are kept
+            if self.store:
+                return self.store.select(self._type, self.name, **where)
+
+            data, timestamp = self.stream()
+            return [item for item in data if IssueStore.match(IssueStore.columnsOf(item), where)], timestamp
 
     class Tracker(DataObject):
         _type = 'Tracker'
@@ -45,6 +146,51 @@ class DataEngine:
         def __init__(self, trackername, storage):
             super().__init__(trackername, storage)
 
+        @property
+        def history(self):
+            return History(self._type, self.name, self.storage, checkpoint=settings.store['checkpoint'])
+
+        def _recorders(self, timestamp):
+            # every snapshot is kept in the tracker history as the issues changed since the previous one
+            recorders = [self.history.recorder(timestamp)]
+            if not self.store:
+                # the partition index goes along with the tracker file
+                filename = 'FIWARE.Engine.{}.{}.partition.pkl'.format(self._type, self.name)
+                recorders.append(DataEngine.PartitionRecorder(os.path.join(self.storage, filename), timestamp))
+            return recorders
+
+        def _saved(self, timestamp):
+            self.history.retain(settings.store['history'])
+
+        def _partition(self, timestamp):
+            # the partition index saved along with the data of that timestamp, None if there isn't one
+            filename = 'FIWARE.Engine.{}.{}.partition.pkl'.format(self._type, self.name)
+            try:
+                with open(os.path.join(self.storage, filename), 'rb') as f:
+                    _timestamp, partition = pickle.load(f)
+            except Exception:
+                return None
+            return partition if _timestamp == timestamp else None
+
+        def partition(self, data, timestamp):
+            # an index older than the data is rebuilt in memory
+            partition = self._partition(timestamp)
+            return partition if partition is not None else DataEngine.partitionOf(data)
+
+        def select(self, **where):
+            if self.store or list(where) != ['component']:
+                return super().select(**where)
+
+            data, timestamp = self.stream()
+            partition = self._partition(timestamp)
+            if partition is None:
+                return [item for item in data if IssueStore.columnsOf(item)['component'] == where['component']], \
+                    timestamp
+
+            # only the issues of the component are kept from the stream
+            positions = set(partition.get(where['component'], ()))
+            return [item for position, item in enumerate(data) if position in positions], timestamp
+
     class Comp(DataObject):
         _type = 'Component'
 
@@ -61,22 +207,135 @@ class DataEngine:
         self.storage = storage
         # self.jira = JIRA()
 
+    class PartitionRecorder:
+        # the partition index of the issues saved, built as they come
+        def __init__(self, filename, timestamp):
+            self.filename = filename
+            self.timestamp = timestamp
+            self.partition = dict()
+            self.position = 0
+
+        def add(self, item):
+            self.partition.setdefault(IssueStore.columnsOf(item)['component'], []).append(self.position)
+            self.position += 1
+
+        def abort(self):
+            pass
+
+        def close(self):
+            with open(self.filename, 'wb') as f:
+                pickle.dump((self.timestamp, self.partition), f, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def recorded(data, recorders):
+        # data passed through, every item given to the recorders on its way
+        for item in data:
+            for recorder in recorders:
+                recorder.add(item)
+            yield item
+
+    @staticmethod
+    def partitionOf(data):
+        # component id -> positions of its issues in data; issues without component go under None
+        partition = dict()
+        for position, item in enumerate(data):
+            partition.setdefault(IssueStore.columnsOf(item)['component'], []).append(position)
+        return partition
+
     @classmethod
-    def snapshot(cls, storage):
+    def snapshot(cls, storage, mode=None):
+        # trackers are fetched concurrently, each one is saved as soon as it is done
+        # and the failing ones are retried without touching those already saved
+        mode = mode if mode else settings.snapshot['mode']
         jira = JIRA()
-        files = list()
+        # the snapshot run is the one refreshing the component leaders; imports stay off the network
+        tComponentsBook.refreshLeaders()
+        files = dict()
+        pending = list(trackersBook)
+        total = len(pending)
+
+        for attempt in range(settings.snapshot['retries'] + 1):
+            failed = list()
+
+            with ThreadPoolExecutor(max_workers=settings.snapshot['workers']) as executor:
+                futures = {executor.submit(cls._snapshotTracker, jira, trackername, storage, mode): trackername
+                           for trackername in pending}
+
+                for future in as_completed(futures):
+                    trackername = futures[future]
+                    try:
+                        files[trackername] = future.result()
+                    except Exception as error:
+                        failed.append(trackername)
+                        print('snapshot: {} failed ({})'.format(trackername, type(error).__name__))
+                    else:
+                        print('snapshot: {} saved [{}/{}]'.format(trackername, len(files), total))
+
+            if not failed:
+                break
+
+            pending = failed
 
-        for trackername in trackersBook:
-            tracker = trackersBook[trackername]
-            data = jira.getTrackerData(tracker.keystone)
-            filename = DataEngine.Tracker(trackername, storage).save(data)
-            files.append(filename)
+        if failed:
+            print('snapshot: trackers not saved = {}'.format(', '.join(failed)))
 
-        return files
+        return [files[trackername] for trackername in trackersBook if trackername in files]
+
+    @classmethod
+    def _snapshotTracker(cls, jira, trackername, storage, mode):
+        tracker = trackersBook[trackername]
+
+        if mode == 'incremental':
+            return cls._sync(jira, trackername, tracker, storage)
+
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M")
+        data = jira.iterTrackerData(tracker.keystone)
+        return DataEngine.Tracker(trackername, storage).save(data, timestamp)
+
+    @staticmethod
+    def watermarkOf(data, timestamp):
+        # latest update among the stored issues, as the server wrote it; the local time
+        # the data was saved at when none of them has one
+        updates = {item['fields'].get('updated') for item in data} - {None}
+        if updates:
+            return max(jiraDateTime(value) for value in updates)
+        return datetime.strptime(timestamp, "%Y%m%d-%H%M").astimezone()
+
+    @staticmethod
+    def _sync(jira, trackername, tracker, storage):
+        # issues updated since the latest update stored, less the overlap, are fetched again
+        dataObject = DataEngine.Tracker(trackername, storage)
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M")
+
+        try:
+            storedData, watermark = dataObject.load()
+            since = DataEngine.watermarkOf(storedData, watermark) - timedelta(minutes=settings.snapshot['overlap'])
+        except Exception:
+            data = jira.iterTrackerData(tracker.keystone)
+            return dataObject.save(data, timestamp)
+
+        changedData = jira.getTrackerData(tracker.keystone, updated_since=since)
+        keys = jira.getTrackerKeys(tracker.keystone)
+
+        issues = {issue['key']: issue for issue in storedData}
+        issues.update((issue['key'], issue) for issue in changedData)
+
+        # deleted or moved issues are no longer among the tracker keys
+        data = [issues[key] for key in keys if key in issues]
+
+        return dataObject.save(data, timestamp)
 
     def getTrackerData(self, tracker_id):
         tracker = trackersBookByKey[tracker_id]
-        return DataEngine.Tracker(tracker.name, self.storage).load()
+        return DataEngine.Tracker(tracker.name, self.storage).view()
+
+    def getTrackerDataAsOf(self, tracker_id, timestamp):
+        # (data, timestamp) of the tracker as it was saved last at timestamp, a datetime
+        # or a "%Y%m%d-%H%M" string, among the versions kept in its history
+        tracker = trackersBookByKey[tracker_id]
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.strftime("%Y%m%d-%H%M")
+        return DataEngine.Tracker(tracker.name, self.storage).history.load(timestamp)
 
     def saveTrackerData(self, tracker_id, data):
         tracker = trackersBookByKey[tracker_id]
@@ -86,22 +345,17 @@ class DataEngine:
         comp = tComponentsBook[cmp_id]
         name = '{}-{}'.format(comp.name, cmp_id)
         try:
-            return DataEngine.Comp(name, self.storage).load()
+            return DataEngine.Comp(name, self.storage).view()
         except Exception:
-            tracker = trackersBookByKey[comp.tracker]
-            trackerData, timestamp = DataEngine.Tracker(tracker.name, self.storage).load()
-            data = list()
-
-            for item in trackerData:
-                try:
-                    key = item['fields']['components'][0]['id']
-                except Exception:
-                    continue
+            return self.getTrackerComponentData(comp.tracker, cmp_id)
 
-                if cmp_id == key:
-                    data.append(item)
+    def getTrackerPartition(self, tracker_id, data, timestamp):
+        tracker = trackersBookByKey[tracker_id]
+        return DataEngine.Tracker(tracker.name, self.storage).partition(data, timestamp)
 
-            return data, timestamp
+    def getTrackerComponentData(self, tracker_id, cmp_id):
+        tracker = trackersBookByKey[tracker_id]
+        return DataEngine.Tracker(tracker.name, self.storage).select(component=cmp_id)
 
     def saveComponentData(self, cmp_id, data):
         cmp = tComponentsBook[cmp_id]
@@ -109,22 +363,108 @@ class DataEngine:
         DataEngine.Comp(name, self.storage).save(data)
 
     def getQueryData(self, name):
-        return DataEngine.Query(name, self.storage).load()
+        return DataEngine.Query(name, self.storage).view()
 
     def saveQueryData(self, name, data):
         DataEngine.Query(name, self.storage).save(data)
 
 
+class TrackersData:
+    """
+    Tracker data (data, timestamp) by tracker key, loaded from the store on first access.
+    With a limit, only the 'limit' most recently used trackers are kept in memory.
+    """
+    def __init__(self, storage, limit=0, load=None):
+        self.engine = DataEngine(storage)
+        self.limit = limit
+        self._load = load if load else self.engine.getTrackerData
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, tracker_id):
+        with self._lock:
+            if tracker_id in self._data:
+                self._data.move_to_end(tracker_id)
+                return self._data[tracker_id]
+
+        data = self._load(tracker_id)
+
+        with self._lock:
+            self._data[tracker_id] = data
+            while self.limit and len(self._data) > self.limit:
+                self._data.popitem(last=False)
+        return data
+
+    def __contains__(self, tracker_id):
+        return tracker_id in trackersBookByKey
+
+    def __iter__(self):
+        return iter(trackersBookByKey)
+
+    def __len__(self):
+        return len(trackersBookByKey)
+
+    def keys(self):
+        return trackersBookByKey.keys()
+
+    def loaded(self):
+        return list(self._data)
+
+
 class DataFactory:
+    # components and queries are fetched once per run: concurrent requests for the same one
+    # wait for the fetch in flight, later requests get its result
+    _inflight = dict()
+    _results = dict()
+    _lock = threading.Lock()
+
     def __init__(self, storage):
+        self.storage = storage
         self.engine = DataEngine(storage)
 
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._results.clear()
+
+    def _coalesce(self, key, fetch):
+        key = (self.storage,) + key
+        with DataFactory._lock:
+            if key in DataFactory._results:
+                return DataFactory._results[key]
+            future = DataFactory._inflight.get(key)
+            if future is None:
+                future = DataFactory._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = fetch()
+        except Exception as error:
+            with DataFactory._lock:
+                del DataFactory._inflight[key]
+            future.set_exception(error)
+            raise
+
+        with DataFactory._lock:
+            DataFactory._results[key] = result
+            del DataFactory._inflight[key]
+        future.set_result(result)
+        return result
+
     def getTrackerData(self, tracker_id):
         data, timestamp = self.engine.getTrackerData(tracker_id)
         source = 'store'
         return data, timestamp, source
 
     def getComponentData(self, cmp_id):
+        return self._coalesce(('component', cmp_id), lambda: self._getComponentData(cmp_id))
+
+    def _getComponentData(self, cmp_id):
         try:
             data = JIRA().getComponentData(cmp_id)
             self.engine.saveComponentData(cmp_id, data)
@@ -137,6 +477,9 @@ class DataFactory:
         return data, timestamp, source
 
     def getQueryData(self, name, jql):
+        return self._coalesce(('query', name, jql), lambda: self._getQueryData(name, jql))
+
+    def _getQueryData(self, name, jql):
         try:
             data = JIRA().getQuery(jql)
             self.engine.saveQueryData(name, data)
@@ -151,6 +494,9 @@ class DataFactory:
     def getTrackerNoComponentData(self, tracker_id):
         jql = 'project = {} AND component = EMPTY'.format(tracker_id)
         name = '{}-NoComp'.format(tracker_id)
+        return self._coalesce(('query', name, jql), lambda: self._getTrackerNoComponentData(name, jql))
+
+    def _getTrackerNoComponentData(self, name, jql):
         try:
             data = JIRA().getQuery(jql)
             self.engine.saveQueryData(name, data)
@@ -0,0 +1,35 @@
+from datetime import date, datetime
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+# issues share most of their days: every day is decoded once
+_days = dict()
+
+
+def jiraDate(value):
+    # date of a JIRA date or datetime ('2016-01-31', '2016-01-31T10:20:30.000+0100'), None if there is none;
+    # only the day is read, as strptime(value[:10], '%Y-%m-%d') did
+    if not value:
+        return None
+    day = value[:10]
+    try:
+        return _days[day]
+    except KeyError:
+        pass
+
+    if len(day) != 10 or day[4] != '-' or day[7] != '-':
+        raise ValueError('{!r} is not a JIRA date'.format(value))
+    _date = date(int(day[:4]), int(day[5:7]), int(day[8:]))
+    _days[day] = _date
+    return _date
+
+
+def jiraDateTime(value):
+    # aware datetime of a JIRA datetime ('2016-01-31T10:20:30.000+0100'), None if there is none
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,41 @@
+import importlib
+from collections import OrderedDict
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class FieldsBook:
+    """
+    JIRA fields requested by a query, as the union of the fields declared by its consumers.
+    A consumer is a class, given by its dotted path, declaring the fields it reads in _jiraFields;
+    its bases and subclasses are taken into account as well.
+    """
+    def _consumer(self, path):
+        module, _, name = path.rpartition('.')
+        return getattr(importlib.import_module(module), name)
+
+    def _classes(self, consumer):
+        classes = list(consumer.__mro__)
+        pending = list(consumer.__subclasses__())
+        while pending:
+            cls = pending.pop(0)
+            classes.append(cls)
+            pending.extend(cls.__subclasses__())
+        return classes
+
+    def fields(self, *consumers):
+        fields = OrderedDict()
+        for path in consumers:
+            for cls in self._classes(self._consumer(path)):
+                for field in cls.__dict__.get('_jiraFields', ()):
+                    fields[field] = True
+        return list(fields)
+
+    def query(self, *consumers):
+        return ','.join(self.fields(*consumers))
+
+
+fieldsBook = FieldsBook()
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,311 @@
+import os
+import pickle
+import bisect
+import shutil
+import threading
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class History:
+    """
+    Versions of a list of issues kept as one base snapshot plus one delta per later version.
+    A delta holds the keys removed and the issues added or changed since the previous version,
+    an issue being changed when its version (e.g. its 'updated' field) is not the same,
+    plus the order of the keys in that version.
+    Every 'checkpoint' versions the whole version is kept too, so that any version is rebuilt
+    from the nearest checkpoint before it and the few deltas in between.
+    A version is appended from issues handed one at a time (recorder()): only their keys and
+    versions and the issues changed are kept in memory, whole versions are written as they come,
+    one pickle per issue after a (timestamp, None) header and up to a closing None.
+    Files:
+        FIWARE.History.<kind>.<name>.base.pkl        - (timestamp, issues) of the oldest version kept
+        FIWARE.History.<kind>.<name>.deltas.pkl      - appended (timestamp, removed keys, changed issues, keys) records
+        FIWARE.History.<kind>.<name>.checkpoints.pkl - appended (timestamp, issues) records
+        FIWARE.History.<kind>.<name>.index.pkl       - offsets of the deltas, (version, offset) of the checkpoints
+        FIWARE.History.<kind>.<name>.head.pkl        - timestamps, order and issue versions of the latest one
+    """
+    checkpoint = 10
+
+    _locks = dict()
+    _lock = threading.Lock()
+
+    def __init__(self, kind, name, storage, key=None, version=None, checkpoint=None):
+        self.kind = kind
+        self.name = name
+        self.storage = storage
+        self.key = key if key else lambda issue: issue['key']
+        self.version = version if version else lambda issue: issue['fields']['updated']
+        self.checkpoint = checkpoint if checkpoint else History.checkpoint
+        with History._lock:
+            self._lock = History._locks.setdefault((storage, kind, name), threading.Lock())
+
+    def _filename(self, part):
+        return os.path.join(self.storage, 'FIWARE.History.{}.{}.{}.pkl'.format(self.kind, self.name, part))
+
+    def _head(self):
+        try:
+            with open(self._filename('head'), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _saveHead(self, timestamps, keys, versions):
+        tmpfile = '{}.tmp'.format(self._filename('head'))
+        with open(tmpfile, 'wb') as f:
+            pickle.dump((timestamps, keys, versions), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, self._filename('head'))
+
+    def _records(self):
+        try:
+            with open(self._filename('deltas'), 'rb') as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        return
+        except FileNotFoundError:
+            return
+
+    def _saveIndex(self, offsets, checkpoints):
+        tmpfile = '{}.tmp'.format(self._filename('index'))
+        with open(tmpfile, 'wb') as f:
+            pickle.dump((offsets, checkpoints), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, self._filename('index'))
+
+    def _index(self, head):
+        # (offsets, checkpoints); histories written before the index had no checkpoints,
+        # their deltas are scanned once for their offsets
+        try:
+            with open(self._filename('index'), 'rb') as f:
+                offsets, checkpoints = pickle.load(f)
+            if len(offsets) == len(head[0]) - 1:
+                return offsets, checkpoints
+        except FileNotFoundError:
+            pass
+
+        offsets = list()
+        try:
+            with open(self._filename('deltas'), 'rb') as f:
+                while True:
+                    offset = f.tell()
+                    try:
+                        pickle.load(f)
+                    except EOFError:
+                        break
+                    offsets.append(offset)
+        except FileNotFoundError:
+            pass
+        return offsets, []
+
+    def versions(self):
+        head = self._head()
+        return list(head[0]) if head else []
+
+    @staticmethod
+    def _dumpVersion(f, timestamp, issues):
+        pickle.dump((timestamp, None), f, pickle.HIGHEST_PROTOCOL)
+        for issue in issues:
+            pickle.dump(issue, f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(None, f, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loadVersion(f):
+        # (timestamp, issues) of a whole version, streamed or written as one (timestamp, issues) pickle
+        timestamp, issues = pickle.load(f)
+        if issues is None:
+            issues = list(iter(lambda: pickle.load(f), None))
+        return timestamp, issues
+
+    def recorder(self, timestamp):
+        # the version at timestamp, appended from issues given to add() once close() is called
+        return _Recorder(self, timestamp)
+
+    def append(self, timestamp, issues):
+        recorder = self.recorder(timestamp)
+        try:
+            for issue in issues:
+                recorder.add(issue)
+        except Exception:
+            recorder.abort()
+            raise
+        recorder.close()
+
+    def _replay(self, until=None):
+        # yields (timestamp, issues by key, keys) for every version up to 'until'
+        with open(self._filename('base'), 'rb') as f:
+            timestamp, issues = self._loadVersion(f)
+        state = {self.key(issue): issue for issue in issues}
+        keys = [self.key(issue) for issue in issues]
+        if until is not None and timestamp > until:
+            return
+        yield timestamp, state, keys
+
+        for timestamp, removed, changed, keys in self._records():
+            if until is not None and timestamp > until:
+                return
+            for key in removed:
+                state.pop(key, None)
+            for issue in changed:
+                state[self.key(issue)] = issue
+            yield timestamp, state, keys
+
+    def load(self, timestamp=None):
+        # the latest version, or the one in force at timestamp; (issues, timestamp)
+        head = self._head()
+        timestamps = head[0] if head else []
+        version = bisect.bisect_right(timestamps, timestamp) - 1 if timestamp is not None else len(timestamps) - 1
+        if version < 0:
+            raise FileNotFoundError('no version of {}.{} at {}'.format(self.kind, self.name, timestamp))
+        offsets, checkpoints = self._index(head)
+
+        # the nearest checkpoint at or before the version, the base if there is none
+        n = bisect.bisect_right([_version for _version, offset in checkpoints], version) - 1
+        if n < 0:
+            start = 0
+            with open(self._filename('base'), 'rb') as f:
+                _timestamp, issues = self._loadVersion(f)
+        else:
+            start, offset = checkpoints[n]
+            with open(self._filename('checkpoints'), 'rb') as f:
+                f.seek(offset)
+                _timestamp, issues = self._loadVersion(f)
+
+        state = {self.key(issue): issue for issue in issues}
+        keys = [self.key(issue) for issue in issues]
+        if version > start:
+            with open(self._filename('deltas'), 'rb') as f:
+                # record n of the deltas file is version n + 1
+                f.seek(offsets[start])
+                for n in range(start, version):
+                    _timestamp, removed, changed, keys = pickle.load(f)
+                    for key in removed:
+                        state.pop(key, None)
+                    for issue in changed:
+                        state[self.key(issue)] = issue
+        return [state[key] for key in keys], _timestamp
+
+    def retain(self, keep):
+        # folds the oldest versions into the base once there are twice as many as 'keep',
+        # so the base is rewritten every 'keep' versions and not on every save
+        with self._lock:
+            head = self._head()
+            if head is None or not keep or len(head[0]) <= 2 * keep:
+                return
+            timestamps = head[0]
+            first = len(timestamps) - keep
+
+            for n, (timestamp, state, keys) in enumerate(self._replay()):
+                if n == first:
+                    base = (timestamp, [state[key] for key in keys])
+                    break
+            # record n of the deltas file is version n + 1
+            records = [record for n, record in enumerate(self._records()) if n + 1 > first]
+            offsets, checkpoints = self._index(head)
+            kept = list()
+            if checkpoints:
+                with open(self._filename('checkpoints'), 'rb') as f:
+                    for version, offset in checkpoints:
+                        if version > first:
+                            f.seek(offset)
+                            kept.append((version - first, self._loadVersion(f)))
+
+            tmpfile = '{}.tmp'.format(self._filename('base'))
+            with open(tmpfile, 'wb') as f:
+                self._dumpVersion(f, *base)
+            os.replace(tmpfile, self._filename('base'))
+
+            offsets = list()
+            tmpfile = '{}.tmp'.format(self._filename('deltas'))
+            with open(tmpfile, 'wb') as f:
+                for record in records:
+                    offsets.append(f.tell())
+                    pickle.dump(record, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpfile, self._filename('deltas'))
+
+            checkpoints = list()
+            tmpfile = '{}.tmp'.format(self._filename('checkpoints'))
+            with open(tmpfile, 'wb') as f:
+                for version, record in kept:
+                    checkpoints.append((version, f.tell()))
+                    self._dumpVersion(f, *record)
+            os.replace(tmpfile, self._filename('checkpoints'))
+
+            self._saveIndex(offsets, checkpoints)
+            self._saveHead(timestamps[-keep:], head[1], head[2])
+
+
+class _Recorder:
+    # a version being appended to a History: the history is locked from the first issue to close() or abort()
+    def __init__(self, history, timestamp):
+        self.history = history
+        self.timestamp = timestamp
+        self.keys, self.versions, self.changed = list(), dict(), list()
+        history._lock.acquire()
+        try:
+            self.head = history._head()
+            # the base, or a checkpoint, is written aside as the issues come
+            self.whole = None
+            if self.head is None or len(self.head[0]) % history.checkpoint == 0:
+                self.tmpfile = '{}.tmp'.format(history._filename('version'))
+                self.whole = open(self.tmpfile, 'wb')
+                pickle.dump((timestamp, None), self.whole, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            history._lock.release()
+            raise
+
+    def add(self, issue):
+        key, version = self.history.key(issue), self.history.version(issue)
+        self.keys.append(key)
+        self.versions[key] = version
+        if self.head is not None and (key not in self.head[2] or self.head[2][key] != version):
+            self.changed.append(issue)
+        if self.whole:
+            pickle.dump(issue, self.whole, pickle.HIGHEST_PROTOCOL)
+
+    def abort(self):
+        try:
+            if self.whole:
+                self.whole.close()
+                os.remove(self.tmpfile)
+        finally:
+            self.history._lock.release()
+
+    def close(self):
+        history = self.history
+        try:
+            if self.whole:
+                pickle.dump(None, self.whole, pickle.HIGHEST_PROTOCOL)
+                self.whole.close()
+
+            if self.head is None:
+                os.replace(self.tmpfile, history._filename('base'))
+                for part in ('deltas', 'checkpoints'):
+                    if os.path.exists(history._filename(part)):
+                        os.remove(history._filename(part))
+                history._saveIndex([], [])
+                history._saveHead([self.timestamp], self.keys, self.versions)
+                return
+
+            timestamps, _keys, _versions = self.head
+            offsets, checkpoints = history._index(self.head)
+            removed = [key for key in _keys if key not in self.versions]
+            with open(history._filename('deltas'), 'ab') as f:
+                offsets.append(f.tell())
+                pickle.dump((self.timestamp, removed, self.changed, self.keys), f, pickle.HIGHEST_PROTOCOL)
+
+            if self.whole:
+                # version number of the one appended, the base being version 0
+                with open(history._filename('checkpoints'), 'ab') as f, open(self.tmpfile, 'rb') as whole:
+                    checkpoints.append((len(timestamps), f.tell()))
+                    shutil.copyfileobj(whole, f)
+                os.remove(self.tmpfile)
+
+            history._saveIndex(offsets, checkpoints)
+            history._saveHead(timestamps + [self.timestamp], self.keys, self.versions)
+        finally:
+            history._lock.release()
+
+
+if __name__ == "__main__":
+    pass
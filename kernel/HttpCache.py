@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from kernel.Settings import settings
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class HttpCache:
+    """
+    On-disk cache of JSON answers keyed by url and query parameters.
+    Fresh entries (younger than ttl hours) are served without network; stale ones are
+    revalidated with If-None-Match / If-Modified-Since, so a 304 answer only refreshes the entry.
+    In offline mode any stored entry is served, whatever its age.
+    """
+    _singlenton = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls):
+        with cls._lock:
+            if cls._singlenton is None:
+                cls._singlenton = HttpCache()
+        return cls._singlenton
+
+    def __init__(self):
+        # a directory of its own: the cache home also holds the NamesCache maps, which clear() keeps
+        self.home = os.path.join(settings.storeHome, settings.cache['home'], 'http')
+        self.ttl = settings.cache['ttl'] * 3600
+        self.enabled = settings.cache['enabled'] == 'yes'
+        self.offline = settings.cache['offline'] == 'yes'
+        self._write_lock = threading.Lock()
+
+    def _filename(self, url, params):
+        key = url if not params else '{}?{}'.format(url, json.dumps(params, sort_keys=True))
+        return os.path.join(self.home, '{}.json'.format(hashlib.sha1(key.encode('utf-8')).hexdigest()))
+
+    def _load(self, filename):
+        try:
+            with open(filename, 'r') as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _save(self, filename, entry):
+        with self._write_lock:
+            os.makedirs(self.home, exist_ok=True)
+            tmpfile = '{}.{}.tmp'.format(filename, threading.get_ident())
+            with open(tmpfile, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmpfile, filename)
+
+    def get(self, session, url, params=None, **kwargs):
+        if not self.enabled:
+            return session.get(url, params=params, **kwargs).json()
+
+        filename = self._filename(url, params)
+        entry = self._load(filename)
+        if entry and (self.offline or time.time() - entry['stored'] < self.ttl):
+            return entry['data']
+
+        headers = dict()
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['lastModified']:
+            headers['If-Modified-Since'] = entry['lastModified']
+
+        answer = session.get(url, params=params, headers=headers, **kwargs)
+        if entry and answer.status_code == 304:
+            entry['stored'] = time.time()
+            self._save(filename, entry)
+            return entry['data']
+
+        data = answer.json()
+        if answer.ok:
+            self._save(filename, {'url': answer.url,
+                                  'etag': answer.headers.get('ETag'),
+                                  'lastModified': answer.headers.get('Last-Modified'),
+                                  'stored': time.time(),
+                                  'data': data})
+        return data
+
+    def clear(self):
+        with self._write_lock:
+            if os.path.isdir(self.home):
+                for filename in os.listdir(self.home):
+                    os.remove(os.path.join(self.home, filename))
+
+
+if __name__ == "__main__":
+    pass
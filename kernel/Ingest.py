@@ -0,0 +1,66 @@
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class Ingest:
+    """
+    Issues as the DataEngine stores them: JIRA's nested shape is kept, since the whole kernel
+    reads issue['fields'][...], but every nested record is pruned to the keys the kernel reads
+    (avatars, self links, ids of statuses, ... are dropped) and equal records and their
+    strings are shared by all the issues that went through the same Ingest.
+    """
+    subkeys = {'project': ('key', 'name'),
+               'status': ('name',),
+               'issuetype': ('name',),
+               'priority': ('name',),
+               'resolution': ('name',),
+               'assignee': ('displayName', 'name'),
+               'reporter': ('displayName', 'name'),
+               'components': ('id', 'name'),
+               'fixVersions': ('name', 'releaseDate'),
+               'customfield_11103': ('value',),
+               'customfield_11104': ('value',),
+               'customfield_11105': ('value',)}
+
+    def __init__(self):
+        self._values = dict()
+
+    def _intern(self, value):
+        key = tuple(sorted(value.items())) if isinstance(value, dict) else value
+        return self._values.setdefault(key, value)
+
+    def _record(self, name, value):
+        if not isinstance(value, dict):
+            return value
+        return self._intern({key: self._intern(value[key]) if isinstance(value[key], str) else value[key]
+                             for key in Ingest.subkeys[name] if key in value})
+
+    def _link(self, link):
+        # linked issues: their key and status only
+        record = {'id': link.get('id')}
+        for _type in ('inwardIssue', 'outwardIssue'):
+            if _type in link:
+                record[_type] = {'key': link[_type]['key'],
+                                 'fields': {'status': self._record('status', link[_type]['fields']['status'])}}
+        return record
+
+    def _field(self, name, value):
+        if value is None:
+            return None
+        if name in Ingest.subkeys:
+            return [self._record(name, item) for item in value] if isinstance(value, list) \
+                else self._record(name, value)
+        if name == 'issuelinks':
+            return [self._link(link) for link in value]
+        return value
+
+    def __call__(self, issue):
+        return {'key': issue['key'],
+                'id': issue.get('id'),
+                'fields': {name: self._field(name, issue['fields'][name]) for name in issue['fields']}}
+
+    def all(self, issues):
+        return [self(issue) for issue in issues]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,51 @@
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class IssueRecord:
+    """
+    Base of the issue models kept in __slots__ rather than in a dict per issue.
+    Their values are still read and written as issue['key'], as when they were dicts:
+    _fields are those keys, _aliases the keys whose slot has another name.
+    Pickles hold the slots set, and dict-like pickles of former issues load into them.
+    """
+    __slots__ = ()
+    _fields = ()
+    _aliases = {}
+
+    def _slot(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return self._aliases.get(key, key)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._slot(key))
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, self._slot(key), value)
+
+    def __contains__(self, key):
+        return key in self._fields and hasattr(self, self._aliases.get(key, key))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in self._fields if key in self]
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for cls in type(self).__mro__
+                for name in getattr(cls, '__slots__', ()) if hasattr(self, name)}
+
+    def __setstate__(self, state):
+        for name in state:
+            setattr(self, name, state[name])
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,144 @@
+import os
+import pickle
+import sqlite3
+import threading
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class IssueStore:
+    """
+    SQLite backend of the DataEngine: one row per issue, with the raw issue pickled in 'data'
+    and the fields used for lookups copied into indexed columns.
+    Every tracker, component or query saved is an object (type, name) with its timestamp.
+    """
+    filename = 'FIWARE.Engine.db'
+    columns = ('project', 'component', 'issuetype', 'status', 'fixVersion', 'created', 'resolutiondate')
+
+    instances = dict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls, storage):
+        with cls._lock:
+            if storage not in cls.instances:
+                cls.instances[storage] = IssueStore(storage)
+        return cls.instances[storage]
+
+    def __init__(self, storage):
+        self.dbfile = os.path.join(storage, IssueStore.filename)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS objects '
+                               '(type TEXT, name TEXT, timestamp TEXT, PRIMARY KEY (type, name))')
+            connection.execute('CREATE TABLE IF NOT EXISTS issues '
+                               '(type TEXT, name TEXT, position INTEGER, key TEXT, {}, data BLOB)'
+                               .format(', '.join('{} TEXT'.format(column) for column in IssueStore.columns)))
+            connection.execute('CREATE INDEX IF NOT EXISTS issues_object ON issues (type, name, position)')
+            for column in IssueStore.columns:
+                connection.execute('CREATE INDEX IF NOT EXISTS issues_{0} ON issues (type, name, {0})'.format(column))
+
+    def _connection(self):
+        # sqlite connections can't be shared among threads: one per thread
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = sqlite3.connect(self.dbfile, timeout=60)
+        return self._local.connection
+
+    @staticmethod
+    def columnsOf(issue):
+        fields = issue['fields']
+
+        def value(*path):
+            try:
+                item = fields
+                for step in path:
+                    item = item[step]
+                return item
+            except Exception:
+                return None
+
+        created, resolutiondate = value('created'), value('resolutiondate')
+        return {'project': value('project', 'key'),
+                'component': value('components', 0, 'id'),
+                'issuetype': value('issuetype', 'name'),
+                'status': value('status', 'name'),
+                'fixVersion': value('fixVersions', 0, 'name'),
+                'created': created[:10] if created else None,
+                'resolutiondate': resolutiondate[:10] if resolutiondate else None}
+
+    @staticmethod
+    def match(values, where):
+        # a tuple (since, until) selects a range, both ends included and optional
+        for column in where:
+            if isinstance(where[column], tuple):
+                since, until = where[column]
+                if values[column] is None: return False
+                if since is not None and values[column] < since: return False
+                if until is not None and values[column] > until: return False
+            elif values[column] != where[column]:
+                return False
+        return True
+
+    def _rows(self, _type, name, data):
+        for position, issue in enumerate(data):
+            values = IssueStore.columnsOf(issue)
+            yield (_type, name, position, issue['key']) + \
+                  tuple(values[column] for column in IssueStore.columns) + \
+                  (pickle.dumps(issue, pickle.HIGHEST_PROTOCOL),)
+
+    def save(self, _type, name, data, timestamp):
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.execute('DELETE FROM issues WHERE type=? AND name=?', (_type, name))
+            connection.executemany('INSERT INTO issues VALUES ({})'.format(','.join('?' * (len(IssueStore.columns) + 5))),
+                                   self._rows(_type, name, data))
+            connection.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?)', (_type, name, timestamp))
+        return '{}:{}.{}'.format(IssueStore.filename, _type, name)
+
+    def _timestamp(self, _type, name):
+        row = self._connection().execute('SELECT timestamp FROM objects WHERE type=? AND name=?',
+                                         (_type, name)).fetchone()
+        if row is None:
+            raise FileNotFoundError('{}:{}.{}'.format(IssueStore.filename, _type, name))
+        return row[0]
+
+    def header(self, _type, name):
+        timestamp = self._timestamp(_type, name)
+        count = self._connection().execute('SELECT count(*) FROM issues WHERE type=? AND name=?',
+                                           (_type, name)).fetchone()[0]
+        return timestamp, count
+
+    def load(self, _type, name):
+        timestamp = self._timestamp(_type, name)
+        rows = self._connection().execute('SELECT data FROM issues WHERE type=? AND name=? ORDER BY position',
+                                          (_type, name))
+        return [pickle.loads(row[0]) for row in rows], timestamp
+
+    def select(self, _type, name, **where):
+        timestamp = self._timestamp(_type, name)
+        conditions, params = ['type=?', 'name=?'], [_type, name]
+        for column in where:
+            if column not in IssueStore.columns:
+                raise KeyError(column)
+            if isinstance(where[column], tuple):
+                since, until = where[column]
+                conditions.append('{} IS NOT NULL'.format(column))
+                if since is not None:
+                    conditions.append('{} >= ?'.format(column))
+                    params.append(since)
+                if until is not None:
+                    conditions.append('{} <= ?'.format(column))
+                    params.append(until)
+            else:
+                conditions.append('{} IS ?'.format(column))
+                params.append(where[column])
+
+        rows = self._connection().execute('SELECT data FROM issues WHERE {} ORDER BY position'
+                                          .format(' AND '.join(conditions)), params)
+        return [pickle.loads(row[0]) for row in rows], timestamp
+
+
+if __name__ == "__main__":
+    pass
@@ -1,5 +1,6 @@
 import os
 import pickle
+import hashlib
 import re
 import pprint
 from datetime import date, datetime
@@ -11,6 +12,11 @@ from kernel.TrackerBook import trackersBook
 from kernel.NodesBook import tHelpDeskNodesBook
 from kernel.Connector import Connector
 from kernel.Jira import JIRA
+from kernel.FieldsBook import fieldsBook
+from kernel.Manifest import Manifest
+from kernel.History import History
+from kernel.IssueRecord import IssueRecord
+from kernel.DateParser import jiraDate
 
 __author__ = "Manuel Escriche <mev@tid.es>"
 
@@ -43,105 +49,100 @@ class LinkedIssue(dict):
         return self['key']
 
 
-class SimpleIssue(dict):
+class SimpleIssue(IssueRecord):
+    _jiraFields = ('summary', 'status', 'project', 'components', 'priority', 'issuetype', 'description', 'reporter',
+                   'resolution', 'assignee', 'created', 'updated', 'duedate', 'resolutiondate', 'fixVersions',
+                   'issuelinks')
+    _fields = ('key', 'id', 'project', 'component', 'summary', 'status', 'description', 'priority', 'issueType',
+               'reporter', 'resolution', 'assignee', 'duedate', 'created', 'updated', 'resolved', 'version',
+               'nVersions', 'releaseDate', 'jurl', 'cmpName', 'links')
+    # the assignee property reads 'None' for unassigned issues, issue['assignee'] reads None
+    _aliases = {'assignee': '_assignee'}
+    __slots__ = ('key', 'id', 'project', 'component', 'summary', 'status', 'description', 'priority', 'issueType',
+                 'reporter', 'resolution', '_assignee', 'duedate', 'created', 'updated', 'resolved', 'version',
+                 'nVersions', 'releaseDate', 'jurl', 'cmpName', 'links')
+
     def __init__(self, issue):
-        super().__init__()
         # pprint.pprint(issue)
-        self['key'] = issue['key']
-        self['id'] = issue['id']
-        self['project'] = issue['fields']['project']['key']
-        self['component'] = [item['id'] for item in issue['fields']['components']]
-        self['summary'] = issue['fields']['summary'].strip()
-        self['status'] = issue['fields']['status']['name']
-        self['description'] = issue['fields']['description']
+        fields = issue['fields']
+        self.key = issue['key']
+        self.id = issue['id']
+        self.project = fields['project']['key']
+        self.component = [item['id'] for item in fields['components']]
+        self.summary = fields['summary'].strip()
+        self.status = fields['status']['name']
+        self.description = fields['description']
 
         try:
-            self['priority'] = issue['fields']['priority']['name']
+            self.priority = fields['priority']['name']
         except:
-            self['priority'] = 'Major'
+            self.priority = 'Major'
 
-        self['issueType'] = issue['fields']['issuetype']['name']
-        self['reporter'] = issue['fields']['reporter']['displayName']
+        self.issueType = fields['issuetype']['name']
+        self.reporter = fields['reporter']['displayName']
 
-        if issue['fields']['resolution'] != None:
-            self['resolution'] = issue['fields']['resolution']['name'] \
-            if 'name' in issue['fields']['resolution'] else None
+        if fields['resolution'] != None:
+            self.resolution = fields['resolution']['name'] \
+            if 'name' in fields['resolution'] else None
         else:
-            self['resolution'] = None
+            self.resolution = None
 
-        if issue['fields']['assignee'] != None:
-            self['assignee'] = issue['fields']['assignee']['displayName'] \
-                if 'displayName' in issue['fields']['assignee'] else None
+        if fields['assignee'] != None:
+            self._assignee = fields['assignee']['displayName'] \
+                if 'displayName' in fields['assignee'] else None
         else:
-            self['assignee'] = None
+            self._assignee = None
 
-        if 'duedate' in issue['fields']:
-            self['duedate'] = datetime.strptime(issue['fields']['duedate'][:10], '%Y-%m-%d').date() \
-                if issue['fields']['duedate'] else None
-        else:
-            self['duedate'] = None
+        self.duedate = jiraDate(fields.get('duedate'))
 
-        self['created'] = datetime.strptime(issue['fields']['created'][:10], '%Y-%m-%d').date()
-        self['updated'] = datetime.strptime(issue['fields']['updated'][:10], '%Y-%m-%d').date()
+        self.created = jiraDate(fields['created'])
+        self.updated = jiraDate(fields['updated'])
 
-        if 'resolutiondate' in issue['fields']:
-            self['resolved'] = datetime.strptime(issue['fields']['resolutiondate'][:10], '%Y-%m-%d').date()  \
-                if issue['fields']['resolutiondate'] else None
-        else:
-            self['resolved'] = None
-
-        self['version'] = 'Unscheduled'
-        self['nVersions'] = 0
-        if 'fixVersions' in issue['fields']:
-            self['nVersions'] = len(issue['fields']['fixVersions'])
-            if len(issue['fields']['fixVersions']) > 0:
-                self['version'] = issue['fields']['fixVersions'][0]['name']
-                self['releaseDate'] = \
-                    datetime.strptime(issue['fields']['fixVersions'][0]['releaseDate'][:10], '%Y-%m-%d').date()
-
-        self['jurl'] = "http://jira.fiware.org/browse/{}".format(issue['key'])
+        self.resolved = jiraDate(fields.get('resolutiondate'))
+
+        self.version = 'Unscheduled'
+        self.nVersions = 0
+        if 'fixVersions' in fields:
+            self.nVersions = len(fields['fixVersions'])
+            if len(fields['fixVersions']) > 0:
+                self.version = fields['fixVersions'][0]['name']
+                self.releaseDate = jiraDate(fields['fixVersions'][0]['releaseDate'])
+
+        self.jurl = "http://jira.fiware.org/browse/{}".format(issue['key'])
         # print(self['jurl'])
 
         # self['cmpName'] = helpdeskBook.get_compName(self['component'])
-        if not len(self['component']):
-            self['cmpName'] = 'Unassigned'
+        if not len(self.component):
+            self.cmpName = 'Unassigned'
         else:
             try:
-                self['cmpName'] = tComponentsBook[self['component'][0]].name
+                self.cmpName = tComponentsBook[self.component[0]].name
             except:
-                self['cmpName'] = 'Unknown'
+                self.cmpName = 'Unknown'
         # print(self['component'], self['cmpName'])
 
-        _version = self['version'].split()
+        _version = self.version.split()
 
         if len(_version) == 1:
             version = 'Unscheduled'
         else:
             version = _version[1]
 
-        self['links'] = None
-        if 'issuelinks' in issue['fields']:
-            if len(issue['fields']['issuelinks']) > 0:
-                self['links'] = [LinkedIssue(item) for item in issue['fields']['issuelinks']]
+        self.links = None
+        if 'issuelinks' in fields:
+            if len(fields['issuelinks']) > 0:
+                self.links = [LinkedIssue(item) for item in fields['issuelinks']]
 
     def name_test(self):
-        chunks = self['summary'].split('.')
+        chunks = self.summary.split('.')
         if len(chunks) < 3: return False
         project = chunks[0]
         issueType = chunks[1]
-        return True if project == 'FIWARE' and issueType == self['issueType'] else False
-
-    @property
-    def links(self):
-        return self['links']
-
-    @property
-    def key(self):
-        return self['key']
+        return True if project == 'FIWARE' and issueType == self.issueType else False
 
     @property
     def nkey(self):
-        return int(self['key'].split('-')[1])
+        return int(self.key.split('-')[1])
 
     @property
     def name(self):
@@ -149,103 +150,51 @@ class SimpleIssue(dict):
 
     @property
     def shortReference(self):
-        _name = self['summary'].split('.')
+        _name = self.summary.split('.')
         return '.'.join(_name[2:])
 
     @property
     def reference(self):
-        return self['summary']
-
-    @property
-    def description(self):
-        return self['description']
-
-    @property
-    def reporter(self):
-        return self['reporter']
-
-    @property
-    def issueType(self):
-        return self['issueType']
-
-    @property
-    def priority(self):
-        return self['priority']
-
-    @property
-    def status(self):
-        return self['status']
-
-    @property
-    def resolution(self):
-        return self['resolution']
-
-    @property
-    def resolved(self):
-        return self['resolved']
-
-    @property
-    def updated(self):
-        return self['updated']
-
-    @property
-    def created(self):
-        return self['created']
-
-    @property
-    def nVersions(self):
-        return self['nVersions']
+        return self.summary
 
     @property
     def timeSlot(self):
-        return self['version']
+        return self.version
 
     @property
     def nTimeSlot(self):
-        return self['version'].split()[1]
+        return self.version.split()[1]
 
     @property
     def assignee(self):
-        return self['assignee'] if self['assignee'] else 'None'
+        return self._assignee if self._assignee else 'None'
 
     @property
     def age_(self):
-        if self['resolved']:
-            return self['resolved'] - self['created']
-        else: return date.today() - self['created']
+        if self.resolved:
+            return self.resolved - self.created
+        else: return date.today() - self.created
 
     @property
     def age(self):
-        if self['resolved']:
-            return (self['resolved'] - self['created']).days
+        if self.resolved:
+            return (self.resolved - self.created).days
         else:
-            return (date.today() - self['created']).days
-
-    @property
-    def duedate(self):
-        return self['duedate']
+            return (date.today() - self.created).days
 
     @property
     def delay(self):
-        if self['resolved'] and self['duedate']:
-            return (self['resolved'] - self['duedate']).days
+        if self.resolved and self.duedate:
+            return (self.resolved - self.duedate).days
         return (date.today() - self.duedate).days
 
     @property
     def upcoming(self):
         return (self.duedate - date.today()).days
 
-    @property
-    def project(self):
-        return self['project']
-
     @property
     def components(self):
-        return self['component']
-
-    @property
-    def cmpName(self):
-        return self['cmpName']
+        return self.component
 
     @property
     def node(self):
@@ -253,7 +202,7 @@ class SimpleIssue(dict):
 
     @property
     def url(self):
-        return self['jurl']
+        return self.jurl
 
 
 class IssuesList(list):
@@ -305,52 +254,48 @@ class IssuesList(list):
     def sortDict(self):
         return IssuesList._sortDict
 
+    @staticmethod
+    def _history(name):
+        # issues lists change little from one run to the next: only the issues that changed are stored
+        version = lambda issue: hashlib.md5(pickle.dumps(issue, pickle.HIGHEST_PROTOCOL)).digest()
+        return History('issuesList', name, settings.storeHome, key=lambda issue: issue['key'], version=version)
+
     def save(self):
-        longFilename = os.path.join(settings.storeHome, self.filename)
-        with open(longFilename, 'wb') as f:
-            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+        self._history(self.listName).append(self.timestamp, self)
+
+    @staticmethod
+    def _manifest():
+        manifest = Manifest.getInstance(settings.storeHome)
+        manifest.adopt('issuesList',
+                       r'\bFIWARE[.]issuesList[.](?P<name>[\w\.\-\d]+)[.](?P<day>\d{8})[-](?P<time>\d{4})[.]pkl\b')
+        return manifest
 
     @classmethod
-    def fromFile(cls, name):
-        fileList = os.listdir(settings.storeHome)
-
-        mfilter = \
-            re.compile(r'\bFIWARE[.]issuesList[.](?P<name>[\w\.\-\d]+)[.](?P<day>\d{8})[-](?P<time>\d{4})[.]pkl\b')
-
-        record = namedtuple('record', 'filename, day, time')
-        filelist = [record(mfilter.match(f).group(0),
-                           mfilter.match(f).group('day'),
-                           mfilter.match(f).group('time')) for f in fileList if mfilter.match(f)
-                    if mfilter.match(f).group('name') == name]
-        filelist.sort(key=attrgetter('day', 'time'), reverse=True)
-        filename = filelist[0].filename
-        # print('load-fromFile', filename)
-        with open(os.path.join(settings.storeHome, filename), 'rb') as f:
-            return pickle.load(f)
+    def fromFile(cls, name, timestamp=None):
+        try:
+            issues, timestamp = cls._history(name).load(timestamp)
+        except FileNotFoundError:
+            # lists saved as full pickles before the history existed
+            filename = cls._manifest().latest('issuesList', name)
+            with open(os.path.join(settings.storeHome, filename), 'rb') as f:
+                return pickle.load(f)
+
+        issuesList = cls.__new__(cls)
+        list.__init__(issuesList, issues)
+        issuesList.listName = name
+        issuesList.timestamp = timestamp
+        issuesList.filename = 'FIWARE.issuesList.' + name + '.' + timestamp + '.pkl'
+        return issuesList
 
     def clean(self):
-        fileList = os.listdir(settings.storeHome)
-
-        mfilter = \
-            re.compile(r'\bFIWARE[.]issuesList[.](?P<name>[\w\.\-\d]+)[.](?P<day>\d{8})[-](?P<time>\d{4})[.]pkl\b')
-
-        record = namedtuple('record', 'filename, day, time')
-        filelist = [record(mfilter.match(f).group(0),
-                           mfilter.match(f).group('day'),
-                           mfilter.match(f).group('time')) for f in fileList if mfilter.match(f)
-                    if mfilter.match(f).group('name') == self.listName]
-
-        filelist.sort(key=attrgetter('day', 'time'), reverse=True)
-        toRemove = filelist[5:]
-        if len(toRemove) > 0:
-            for item in toRemove:
-                os.remove(os.path.join(settings.storeHome, item.filename))
+        self._history(self.listName).retain(settings.store['history'])
+        # full pickles of former runs are no longer needed
+        self._manifest().retain('issuesList', self.listName, 0)
 
 
 class IssuesFactory:
     _fields = '*navigable'
-    fields = 'summary,status,project,components,priority,issuetype,description,reporter,' \
-             'resolution,assignee,created,updated,duedate,resolutiondate,fixVersions,releaseDate,issuelinks'
+    consumers = ('kernel.IssuesList.SimpleIssue',)
 
     instance = None
 
@@ -369,104 +314,46 @@ class IssuesFactory:
     def getAllHelpDeskIssues(self, request):
         startAt = 0
         if request == 'main':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'project=HELP'}
-            try:
-                data = self.connector.search(payload)
-            except:
-                raise Exception
-
-            totalIssues, receivedIssues = data['total'], len(data['issues'])
-
-            while totalIssues > receivedIssues:
-                payload['startAt'] = receivedIssues
-                try:
-                    _data = self.connector.search(payload)
-                except:
-                    raise Exception
-
-                data['issues'].extend(_data['issues'])
-                receivedIssues = len(data['issues'])
 
-            return IssuesList.fromData('helpdesk.main', data['issues'])
+            return IssuesList.fromData('helpdesk.main', self.connector.iterSearch(payload))
 
         if request == 'main.lab':
             labId = helpdeskCompBook['Lab'].key
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'component={}'.format(labId)}
-            try:
-                data = self.connector.search(payload)
-            except: raise Exception
 
-            totalIssues, receivedIssues = data['total'], len(data['issues'])
-
-            while totalIssues > receivedIssues:
-                payload['startAt'] = receivedIssues
-                data['issues'].extend(self.connector.search(payload)['issues'])
-                receivedIssues = len(data['issues'])
-            return IssuesList.fromData('helpdesk.main.lab', data['issues'])
+            return IssuesList.fromData('helpdesk.main.lab', self.connector.iterSearch(payload))
 
         if request == 'main.tech':
             labId = helpdeskCompBook['Tech'].key
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'component={}'.format(labId)}
-            try:
-                data = self.connector.search(payload)
-            except:
-                raise Exception
-
-            totalIssues, receivedIssues = data['total'], len(data['issues'])
-
-            while totalIssues > receivedIssues:
-                payload['startAt'] = receivedIssues
-                data['issues'].extend(self.connector.search(payload)['issues'])
-                receivedIssues = len(data['issues'])
 
-            return IssuesList.fromData('helpdesk.main.tech', data['issues'])
+            return IssuesList.fromData('helpdesk.main.tech', self.connector.iterSearch(payload))
 
         if request == 'coaches':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'project=HELC'}
-            try:
-                data = self.connector.search(payload)
-            except:
-                raise Exception
 
-            totalIssues, receivedIssues = data['total'], len(data['issues'])
-
-            while totalIssues > receivedIssues:
-                payload['startAt'] = receivedIssues
-                data['issues'].extend(self.connector.search(payload)['issues'])
-                receivedIssues = len(data['issues'])
-
-            return IssuesList.fromData('helpdesk.coaches', data['issues'])
+            return IssuesList.fromData('helpdesk.coaches', self.connector.iterSearch(payload))
 
         if request == 'tools':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'project=SUPP'}
-            try:
-                data = self.connector.search(payload)
-            except:
-                raise Exception
-
-            totalIssues, receivedIssues = data['total'], len(data['issues'])
-
-            while totalIssues > receivedIssues:
-                payload['startAt'] = receivedIssues
-                data['issues'].extend(self.connector.search(payload)['issues'])
-                receivedIssues = len(data['issues'])
 
-            return IssuesList.fromData('helpdesk.tools', data['issues'])
+            return IssuesList.fromData('helpdesk.tools', self.connector.iterSearch(payload))
 
     def getUnresolvedHelpDeskIssues(self, request):
         startAt = 0
         if request == 'main':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'project=HELP AND resolution = Unresolved'}
             try:
@@ -480,7 +367,7 @@ class IssuesFactory:
 
         if request == 'main.lab':
             labId = helpdeskCompBook['Lab'].key
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'component={} AND resolution = Unresolved'.format(labId)}
             try:
@@ -494,7 +381,7 @@ class IssuesFactory:
 
         if request == 'main.tech':
             techId = helpdeskCompBook['Tech'].key
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'component={} AND resolution = Unresolved'.format(techId)}
             try:
@@ -507,7 +394,7 @@ class IssuesFactory:
             return unresolvedIssues
 
         if request == 'coaches':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'project=HELC AND resolution = Unresolved' }
             try:
@@ -520,7 +407,7 @@ class IssuesFactory:
             return unresolvedIssues
 
         if request == 'tools':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'project=SUPP AND resolution = Unresolved'}
             try:
@@ -537,7 +424,7 @@ class IssuesFactory:
         # print(trackers)
         startAt = 0
         if request == 'upcoming':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': "duedate >= 0d AND duedate <= 7d AND status != Closed AND project in ({})"
                        .format(trackers)}
@@ -553,7 +440,7 @@ class IssuesFactory:
             return issues_list
 
         if request == 'impeded':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'status = Impeded AND project in ({})'.format(trackers)}
             try:
@@ -566,7 +453,7 @@ class IssuesFactory:
             return impeded_list
 
         if request == 'blockers':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'issueType not in (Risk, eRequest) AND priority in '
                               '(Blocker, Critical) AND status != Closed AND project in ({})'
@@ -582,7 +469,7 @@ class IssuesFactory:
             return blocker_list
 
         if request == 'overdue':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'duedate < now() AND status != Closed AND project in ({})'
                        .format(trackers)}
@@ -596,7 +483,7 @@ class IssuesFactory:
             return overdue_list
 
         if request == 'aged':
-            payload = {'fields': IssuesFactory.fields,
+            payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                        'maxResults': 1000, 'startAt': startAt,
                        'jql': 'created < -100d AND issuetype not in (Epic, Feature) '
                               'and status not in (Closed, Done, Dismissed) '
@@ -614,7 +501,7 @@ class IssuesFactory:
         jira = JIRA()
         # print('getIssuesFromRequest', request)
         startAt = 0
-        payload = {'fields': IssuesFactory.fields,
+        payload = {'fields': fieldsBook.query(*IssuesFactory.consumers),
                    'maxResults': 1000, 'startAt': startAt,
                    'jql': IssuesFactory.jql[request]}
 
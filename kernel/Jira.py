@@ -1,56 +1,52 @@
-import base64
 import certifi
-import requests
+import threading
 import urllib3
+from dateutil import tz
 from kernel.Settings import settings
+from kernel.FieldsBook import fieldsBook
+from kernel.JiraClient import JiraClient, ConnectionToJIRA, iterIssues
 
 __author__ = 'Manuel Escriche'
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
-class ConnectionToJIRA(Exception):
-    pass
-
-
 class JIRA:
     _fields = '*navigable'
-    fields = 'summary,status,project,components,priority,issuetype,description,reporter,' \
-             'resolution,assignee,created,updated,duedate,resolutiondate,fixVersions,releaseDate,issuelinks,' \
-             'customfield_11103,customfield_11104,customfield_11105'
+    # classes reading the issues fetched by JIRA; the fields they declare make up the search projection
+    consumers = ('kernel.Backlog.Issue', 'kernel.Reviewer.BacklogItemRule', 'kernel.Publisher.PublisherItemRule',
+                 'kernel.NM_Issue.NIssue', 'kernel.NM_Aggregates.Deck')
 
     analysis_start_at = '2016-12-01'
     analysis_finish_on = '2017-11-30'
 
     verify = False
 
+    # page size requested to /search and number of pages fetched at the same time
+    max_results = 1000
+    max_workers = settings.http['workers']
+
     url_api = {
         'project': '/rest/api/latest/project',
         'component': '/rest/api/latest/component/',
         'search': '/rest/api/latest/search',
-        'issue': '/rest/api/latest/issue'
+        'issue': '/rest/api/latest/issue',
+        'myself': '/rest/api/latest/myself'
     }
 
+    # time zone of the JIRA user, in which the server reads the dates written in JQL
+    _timeZone = dict()
+    _lock = threading.Lock()
+
     def __init__(self):
-        username = settings.server['JIRA'].username
-        password = settings.server['JIRA'].password
-        auth = '{}:{}'.format(username, password)
-        keyword = base64.b64encode(bytes(auth, 'utf-8'))
-        access_key = str(keyword)[2:-1]
-        headers = {'Content-Type': 'application/json', "Authorization": "Basic {}".format(access_key)}
-        self.root_url = 'https://{}'.format(settings.server['JIRA'].domain)
-        # print(self.root_url)
-        self.session = requests.session()
-
-        # url = '{}{}'.format(self.root_url, JIRA.url_api['session'])
+        # all JIRA objects share the same logged-in, pooled session
         try:
-            answer = self.session.get(self.root_url, headers=headers, verify=JIRA.verify)
+            self.client = JiraClient.getInstance()
         except ConnectionError:
             raise Exception
-        if answer.status_code != requests.codes.ok:
-            raise ConnectionToJIRA
 
-        self.session.headers.update({'Content-Type': 'application/json'})
+        self.root_url = self.client.root_url
+        self.session = self.client.session
 
     def search(self, params):
         url = '{}{}'.format(self.root_url, JIRA.url_api['search'])
@@ -63,87 +59,80 @@ class JIRA:
         data = answer.json()
         return data
 
-    def getComponentData(self, comp_id):
-        start_at = 0
-
-        jql = 'component={} AND createdDate >= {} AND createdDate <= {}'\
-            .format(comp_id, self.analysis_start_at, self.analysis_finish_on)
+    def _payload(self, jql, fields=None):
+        return {'fields': fields if fields else fieldsBook.query(*JIRA.consumers),
+                'maxResults': JIRA.max_results,
+                'startAt': 0,
+                'jql': jql}
 
-        payload = {'fields': JIRA.fields,
-                   'maxResults': 1000, 'startAt': start_at,
-                   'jql': jql
-                   }
+    def iterSearch(self, payload):
+        # issues are handed out page by page while the next pages are fetched concurrently
+        return iterIssues(self.search, payload, JIRA.max_workers)
 
+    def _paginate(self, payload):
         try:
-            data = self.search(payload)
+            return list(self.iterSearch(payload))
         except Exception:
             raise Exception
 
-        total_issues, received_issues = data['total'], len(data['issues'])
-
-        while total_issues > received_issues:
-            payload['startAt'] = received_issues
-
-            try:
-                data['issues'].extend(self.search(payload)['issues'])
-            except Exception:
-                raise Exception
-
-            received_issues = len(data['issues'])
-
-        return data['issues']
-
-    def getTrackerData(self, tracker_id):
-        start_at = 0
-
-        jql = 'project={} AND createdDate >= {} AND createdDate <= {}'\
-            .format(tracker_id, self.analysis_start_at, self.analysis_finish_on)
+    def iterComponentData(self, comp_id):
+        jql = 'component={} AND createdDate >= {} AND createdDate <= {}'\
+            .format(comp_id, self.analysis_start_at, self.analysis_finish_on)
 
-        payload = {'fields': JIRA.fields,
-                   'maxResults': 1000,
-                   'startAt': start_at,
-                   'jql': jql}
+        return self.iterSearch(self._payload(jql))
 
+    def getComponentData(self, comp_id):
         try:
-            data = self.search(payload)
+            return list(self.iterComponentData(comp_id))
         except Exception:
             raise Exception
 
-        total_issues, received_issues = data['total'], len(data['issues'])
-
-        while total_issues > received_issues:
-            payload['startAt'] = received_issues
-            try:
-                data['issues'].extend(self.search(payload)['issues'])
-            except Exception:
-                raise Exception
+    def timeZone(self):
+        # tzinfo of the JIRA user, None when the server doesn't tell
+        with JIRA._lock:
+            if self.root_url not in JIRA._timeZone:
+                url = '{}{}'.format(self.root_url, JIRA.url_api['myself'])
+                try:
+                    name = self.session.get(url, verify=JIRA.verify).json()['timeZone']
+                    JIRA._timeZone[self.root_url] = tz.gettz(name)
+                except Exception:
+                    return None
+            return JIRA._timeZone[self.root_url]
+
+    def jqlDate(self, moment):
+        # JQL date of a datetime: JIRA reads it in the time zone of its user and to the minute,
+        # so an aware datetime is written in that time zone (the local one if it is unknown)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(self.timeZone())
+        return '"{}"'.format(moment.strftime('%Y/%m/%d %H:%M'))
+
+    def iterTrackerData(self, tracker_id, updated_since=None):
+        jql = 'project={} AND createdDate >= {} AND createdDate <= {}'\
+            .format(tracker_id, self.analysis_start_at, self.analysis_finish_on)
 
-            received_issues = len(data['issues'])
+        if updated_since:
+            jql += ' AND updated >= {}'.format(self.jqlDate(updated_since))
 
-        return data['issues']
+        return self.iterSearch(self._payload(jql))
 
-    def getQuery(self, jql):
-        start_at = 0
-        payload = {'fields': JIRA.fields,
-                   'maxResults': 1000, 'startAt': start_at,
-                   'jql': jql}
+    def getTrackerData(self, tracker_id, updated_since=None):
         try:
-            data = self.search(payload)
+            return list(self.iterTrackerData(tracker_id, updated_since=updated_since))
         except Exception:
             raise Exception
 
-        total_issues, received_issues = data['total'], len(data['issues'])
+    def getTrackerKeys(self, tracker_id):
+        # light query, only the keys of the issues currently in the tracker
+        jql = 'project={} AND createdDate >= {} AND createdDate <= {}'\
+            .format(tracker_id, self.analysis_start_at, self.analysis_finish_on)
 
-        while total_issues > received_issues:
-            payload['startAt'] = received_issues
-            try:
-                data['issues'].extend(self.search(payload)['issues'])
-            except Exception:
-                raise Exception
+        return [issue['key'] for issue in self._paginate(self._payload(jql, fields='key'))]
 
-            received_issues = len(data['issues'])
+    def iterQuery(self, jql):
+        return self.iterSearch(self._payload(jql))
 
-        return data['issues']
+    def getQuery(self, jql):
+        return self._paginate(self._payload(jql))
 
     def getIssue(self, id):
         url = '{}{}/{}'.format(self.root_url, JIRA.url_api['issue'], id)
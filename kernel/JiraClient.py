@@ -0,0 +1,106 @@
+import base64
+import threading
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from requests.adapters import HTTPAdapter
+from kernel.Settings import settings
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class ConnectionToJIRA(Exception):
+    pass
+
+
+class JiraClient:
+    """
+    Process-wide HTTP client for a JIRA server: one login, one keep-alive session
+    and one connection pool shared by every connector of the kernel and the scripts.
+    """
+    url_api = {
+        'session': '/rest/auth/1/session'
+    }
+    instances = dict()
+    verify = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls, server='JIRA'):
+        with cls._lock:
+            if server not in cls.instances:
+                cls.instances[server] = JiraClient(server)
+        return cls.instances[server]
+
+    def __init__(self, server='JIRA'):
+        self.server = settings.server[server]
+        self.root_url = '{}://{}'.format(self.server.scheme, self.server.domain)
+        # print(self.root_url)
+        self.session = requests.session()
+
+        # trackers are snapshot concurrently, each one fetching its pages concurrently:
+        # the pool keeps a connection for every request that can be on its way at the same time
+        adapter = HTTPAdapter(pool_connections=settings.http['pool_connections'],
+                              pool_maxsize=max(settings.http['pool_maxsize'],
+                                               settings.snapshot['workers'] * settings.http['workers']),
+                              max_retries=settings.http['max_retries'])
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._login_lock = threading.Lock()
+        self.login()
+
+    def login(self):
+        auth = '{}:{}'.format(self.server.username, self.server.password)
+        keyword = base64.b64encode(bytes(auth, 'utf-8'))
+        access_key = str(keyword)[2:-1]
+        headers = {'Content-Type': 'application/json', "Authorization": "Basic {}".format(access_key)}
+
+        with self._login_lock:
+            if self.server.login == 'session':
+                # as the help-desk scripts always did: the session answer is not checked
+                url = '{}{}'.format(self.root_url, JiraClient.url_api['session'])
+                self.session.get(url, headers=headers, verify=JiraClient.verify)
+            else:
+                answer = self.session.get(self.root_url, headers=headers, verify=JiraClient.verify)
+                if answer.status_code != requests.codes.ok:
+                    raise ConnectionToJIRA
+
+            self.session.headers.update({'Content-Type': 'application/json'})
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('verify', JiraClient.verify)
+        return self.session.get(url, **kwargs)
+
+
+def iterPages(search, payload, workers=1):
+    # yields the pages of a /search request in order, while up to 'workers' next pages are on their way
+    data = search(payload)
+    yield data['issues']
+
+    total_issues, received_issues = data['total'], len(data['issues'])
+    page_size = data.get('maxResults', payload['maxResults'])
+
+    if total_issues <= received_issues or not page_size:
+        return
+
+    offsets = iter(range(received_issues, total_issues, page_size))
+    fetch = lambda start_at: search(dict(payload, startAt=start_at))['issues']
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        window = deque(executor.submit(fetch, start_at) for start_at in islice(offsets, max(workers, 1)))
+        while window:
+            page = window.popleft().result()
+            for start_at in islice(offsets, 1):
+                window.append(executor.submit(fetch, start_at))
+            yield page
+
+
+def iterIssues(search, payload, workers=1):
+    for page in iterPages(search, payload, workers):
+        yield from page
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import fcntl
+import bisect
+import threading
+from contextlib import contextmanager
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class Manifest:
+    """
+    Append-only log of the artifacts kept in a directory (store, reports): one json line per
+    file written or removed, with its kind, name and timestamp. Replayed on load, it answers
+    which is the latest version of an artifact and which ones are beyond the retention
+    without listing the directory.
+    Several processes may share the log: lines appended by the others are replayed before
+    every answer, and writers take turns on FIWARE.manifest.lock.
+    """
+    filename = 'FIWARE.manifest'
+
+    instances = dict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls, home):
+        with cls._lock:
+            if home not in cls.instances:
+                cls.instances[home] = Manifest(home)
+        return cls.instances[home]
+
+    def __init__(self, home):
+        self.home = home
+        self.logfile = os.path.join(home, Manifest.filename)
+        self._versions = dict()
+        self._adopted = set()
+        # log read so far: file it was read from, bytes and lines replayed
+        self._inode, self._offset, self._lines = None, 0, 0
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._refresh()
+            # removed files leave dead lines behind: rewrite the log once they outnumber the live ones
+            if self._lines > 100 and self._lines > 2 * self._live():
+                with self._fileLock():
+                    self._refresh()
+                    if self._lines > 100 and self._lines > 2 * self._live():
+                        self._compact()
+
+    def _live(self):
+        return len(self._adopted) + sum(len(v) for v in self._versions.values())
+
+    @contextmanager
+    def _fileLock(self):
+        # writers of the same directory, in this process or another one, go one at a time
+        os.makedirs(self.home, exist_ok=True)
+        with open('{}.lock'.format(self.logfile), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        # replays the lines appended since the last read; a log rewritten meanwhile is a new file,
+        # replayed from its start. A last line without its end is still being written: it's left for later
+        try:
+            stat = os.stat(self.logfile)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == self._inode and stat.st_size == self._offset:
+            return
+
+        with open(self.logfile, 'rb') as f:
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._inode:
+                self._versions, self._adopted = dict(), set()
+                self._inode, self._offset, self._lines = inode, 0, 0
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._offset += len(line)
+                self._lines += 1
+                self._replay(json.loads(line.decode('utf-8')))
+
+    def _replay(self, entry):
+        if entry['op'] == 'adopt':
+            self._adopted.add(entry['kind'])
+            return
+
+        versions = self._versions.setdefault((entry['kind'], entry['name']), [])
+        record = (entry['timestamp'], entry['filename'])
+        if entry['op'] == 'add':
+            if record not in versions:
+                bisect.insort(versions, record)
+        elif record in versions:
+            versions.remove(record)
+
+    def _append(self, *entries):
+        # under the file lock: the lines go to the end of the log as it is on disk
+        with open(self.logfile, 'a') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+        self._refresh()
+
+    def _compact(self):
+        # under the file lock, right after a refresh: the state is that of the whole log
+        entries = [{'op': 'adopt', 'kind': kind} for kind in sorted(self._adopted)]
+        entries.extend({'op': 'add', 'kind': kind, 'name': name, 'timestamp': timestamp, 'filename': filename}
+                       for (kind, name) in sorted(self._versions)
+                       for timestamp, filename in self._versions[(kind, name)])
+        tmpfile = '{}.tmp'.format(self.logfile)
+        with open(tmpfile, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmpfile, self.logfile)
+        self._refresh()
+
+    def record(self, kind, name, timestamp, filename):
+        with self._lock, self._fileLock():
+            self._append({'op': 'add', 'kind': kind, 'name': name, 'timestamp': timestamp, 'filename': filename})
+
+    def adopt(self, kind, pattern):
+        # files written before the manifest existed: the directory is scanned once per kind.
+        # pattern has groups 'day' and optionally 'name' and 'time'
+        with self._lock, self._fileLock():
+            self._refresh()
+            if kind in self._adopted:
+                return
+            mfilter = re.compile(pattern)
+            entries = list()
+            for filename in os.listdir(self.home) if os.path.isdir(self.home) else []:
+                match = mfilter.match(filename)
+                if not match:
+                    continue
+                groups = match.groupdict()
+                timestamp = '{}-{}'.format(groups['day'], groups['time']) if groups.get('time') else groups['day']
+                entries.append({'op': 'add', 'kind': kind, 'name': groups.get('name') or '',
+                                'timestamp': timestamp, 'filename': filename})
+            entries.append({'op': 'adopt', 'kind': kind})
+            self._append(*entries)
+
+    def versions(self, kind, name=''):
+        # (timestamp, filename) records, newest first
+        with self._lock:
+            self._refresh()
+            return list(reversed(self._versions.get((kind, name), [])))
+
+    def latest(self, kind, name=''):
+        with self._lock:
+            self._refresh()
+            versions = self._versions.get((kind, name))
+            if not versions:
+                raise FileNotFoundError('{} {} not found in {}'.format(kind, name, self.logfile))
+            return versions[-1][1]
+
+    def retain(self, kind, name='', keep=5):
+        with self._lock, self._fileLock():
+            self._refresh()
+            versions = self._versions.get((kind, name), [])
+            toRemove = versions[:-keep] if keep else list(versions)
+            for timestamp, filename in toRemove:
+                try:
+                    os.remove(os.path.join(self.home, filename))
+                except FileNotFoundError:
+                    pass
+            if toRemove:
+                self._append(*[{'op': 'remove', 'kind': kind, 'name': name, 'timestamp': timestamp,
+                                'filename': filename} for timestamp, filename in toRemove])
+
+
+if __name__ == "__main__":
+    pass
@@ -1,12 +1,14 @@
 import re
 from datetime import date
 from operator import attrgetter
-from collections import Counter
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
 from itertools import accumulate
 from calendar import monthrange
 from kernel.NM_Issue import extRequest, eRequest, Monitor, WorkItem, Epic, Feature, Story, Bug, Risk, iWorkItem, iBug
 from kernel.IssuesModel import backlogIssuesModel
 from kernel.Calendar import calendar as FWcalendar
+from kernel.ColumnSnapshot import ColumnSnapshot
 
 __author__ = "Manuel Escriche <mev@tid.es>"
 
@@ -17,6 +19,13 @@ _IssueTypes = {
 }
 
 
+def _select(data, issueTypes):
+    # from a column snapshot only the issues of the given types are decoded
+    if isinstance(data, ColumnSnapshot):
+        return data.rows(data.where(issuetype=issueTypes))
+    return data
+
+
 # Help Desk
 
 
@@ -133,10 +142,15 @@ class Deck(_Deck):
 
     def __init__(self, data, timestamp, source):
         super().__init__()
-        self.data = data
+        # data may be a stream of issues, it is kept as a list for the decks built later on
+        streamed = not isinstance(data, Sequence)
+        self.data = list() if streamed else data
         self.timestamp = timestamp
         self.source = source
-        for item in data:
+        for item in data if streamed else _select(data, Deck._issueTypes):
+            if streamed:
+                self.data.append(item)
+
             _type = item['fields']['issuetype']['name']
 
             if _type not in ('extRequest', 'eRequest', 'Monitor'):
@@ -148,15 +162,46 @@ class Deck(_Deck):
                 raise Exception('Error while creating issue')
 
 
+class _Partitions:
+    # decks of the same data (one per enabler, chapter or node) share one pass over it:
+    # data is split by the value of a custom field the first time and the split is kept
+    size = 8
+
+    def __init__(self):
+        self._partitions = OrderedDict()
+
+    def __call__(self, data, field):
+        key = (id(data), field)
+        if key not in self._partitions:
+            partition = dict()
+            if isinstance(data, ColumnSnapshot):
+                # split on the column, issues are decoded when a deck reads them
+                positions = dict()
+                for position, code in enumerate(data.codes(field)):
+                    if code >= 0:
+                        positions.setdefault(code, []).append(position)
+                partition = {data.string(code): data.rows(positions[code]) for code in positions}
+            else:
+                for item in data:
+                    try:
+                        partition.setdefault(item['fields'][field]['value'], []).append(item)
+                    except:
+                        continue
+            # data is kept along with its partition so that its id is not reused
+            self._partitions[key] = (data, partition)
+            while len(self._partitions) > _Partitions.size:
+                self._partitions.popitem(last=False)
+        return self._partitions[key][1]
+
+_partitions = _Partitions()
+
+
 class EnablerDeck(Deck):
+    _jiraFields = ('customfield_11105',)
+
     def __init__(self, enabler, data, timestamp, source):
-        indata = list()
-        for item in data:
-            try:
-                if item['fields']['customfield_11105']['value'] == enabler.name:
-                    indata.append(item)
-            except:
-                continue
+        data = data if isinstance(data, Sequence) else list(data)
+        indata = list(_partitions(data, 'customfield_11105').get(enabler.name, []))
         super().__init__(indata, timestamp, source)
         self.enabler = enabler
 
@@ -168,28 +213,22 @@ class EnablerDeck(Deck):
 
 
 class LabDeck(Deck):
+    _jiraFields = ('customfield_11104',)
+
     def __init__(self, node, data, timestamp, source):
-        indata = list()
-        for item in data:
-            try:
-                if item['fields']['customfield_11104']['value'] == node.name:
-                    indata.append(item)
-            except:
-                continue
+        data = data if isinstance(data, Sequence) else list(data)
+        indata = list(_partitions(data, 'customfield_11104').get(node.name, []))
         super().__init__(indata, timestamp, source)
         self.node = node
 
 
 class ChapterDeck(Deck):
+    _jiraFields = ('customfield_11103',)
+
     def __init__(self, chapter, data, timestamp, source):
         self.chapter = chapter
-        indata = list()
-        for item in data:
-            try:
-                if item['fields']['customfield_11103']['value'] == chapter.name:
-                    indata.append(item)
-            except:
-                continue
+        data = data if isinstance(data, Sequence) else list(data)
+        indata = list(_partitions(data, 'customfield_11103').get(chapter.name, []))
 
         super().__init__(indata, timestamp, source)
         #pattern = re.compile(r'FIWARE\.(Request|Question)\.Tech\.{}\.'.format(self.chapter.name))
@@ -233,10 +272,15 @@ class iDeck(_Deck):
 
     def __init__(self, data, timestamp, source):
         super().__init__()
-        self.data = data
+        # data may be a stream of issues, it is kept as a list for the decks built later on
+        streamed = not isinstance(data, Sequence)
+        self.data = list() if streamed else data
         self.timestamp = timestamp
         self.source = source
-        for item in data:
+        for item in data if streamed else _select(data, iDeck._issueTypes):
+            if streamed:
+                self.data.append(item)
+
             _type = item['fields']['issuetype']['name']
             if not _type in iDeck._issueTypes: continue
             try:
@@ -294,7 +338,7 @@ class WorkBacklog(Backlog):
 
     def __init__(self, data, timestamp, source):
         super().__init__(timestamp, source)
-        for item in data:
+        for item in _select(data, WorkBacklog._issueTypes):
             _type = item['fields']['issuetype']['name']
             if not _type in WorkBacklog._issueTypes: continue
             try:
@@ -309,7 +353,7 @@ class RiskBacklog(Backlog):
     def __init__(self, data, timestamp, source):
         super().__init__(timestamp, source)
 
-        for item in data:
+        for item in _select(data, RiskBacklog._issueTypes):
             _type = item['fields']['issuetype']['name']
             if not _type in RiskBacklog._issueTypes: continue
             try:
@@ -324,7 +368,7 @@ class DevBacklog(Backlog):
 
     def __init__(self, data, timestamp, source):
         super().__init__(timestamp, source)
-        for item in data:
+        for item in _select(data, DevBacklog._issueTypes):
             _type = item['fields']['issuetype']['name']
             if not _type in DevBacklog._issueTypes: continue
             try:
@@ -338,7 +382,7 @@ class WorkGroupBacklog(Backlog):
 
     def __init__(self, data, timestamp, source):
         super().__init__(timestamp, source)
-        for item in data:
+        for item in _select(data, DevBacklog._issueTypes):
             _type = item['fields']['issuetype']['name']
 
             if not _type in DevBacklog._issueTypes:
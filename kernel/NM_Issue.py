@@ -3,6 +3,7 @@ __author__ = "Manuel Escriche <mev@tid.es>"
 from datetime import date, datetime
 
 from kernel.Settings import settings
+from kernel.DateParser import jiraDate
 from kernel.Calendar import agileCalendar
 from kernel.ComponentsBook import helpdeskCompBookByKey, accountsDeskBookByKey
 
@@ -23,48 +24,118 @@ class LinkedIssue:
         return self.key
 
 
+class _field:
+    # attribute decoded from the raw issue when it is first read, then kept in the instance
+    def __init__(self, decode):
+        self.decode = decode
+        self.name = decode.__name__
+        self.__doc__ = decode.__doc__
+
+    def __get__(self, issue, owner):
+        if issue is None:
+            return self
+        value = issue.__dict__[self.name] = self.decode(issue)
+        return value
+
+
 class NIssue:
+    _jiraFields = ('summary', 'status', 'project', 'components', 'priority', 'issuetype', 'description', 'reporter',
+                   'assignee', 'created', 'updated', 'duedate', 'resolution', 'resolutiondate', 'fixVersions',
+                   'issuelinks')
+
     def __init__(self, issue):
         # pprint.pprint(issue)
+        # only the type is checked here, every other field is decoded when it is read
         self.issueType = issue['fields']['issuetype']['name']
         if self.issueType != self._issueType:
             raise Exception('Inconsistent Issue Type')
         self.key = issue['key']
-        self.url = "https://{}/browse/{}".format(settings.server['JIRA'].domain,  self.key)
-        self.id = issue['id']
-        self.project = issue['fields']['project']['key']
-        self.component = [item['id'] for item in issue['fields']['components']]
-        self.summary = issue['fields']['summary'].strip()
-        self.status = issue['fields']['status']['name']
-        self.description = issue['fields']['description']
-        self.reporter = issue['fields']['reporter']['displayName']
-
-        self.created = datetime.strptime(issue['fields']['created'][:10], '%Y-%m-%d').date()
-        self.updated = datetime.strptime(issue['fields']['updated'][:10], '%Y-%m-%d').date()
-
-        try: self.priority = issue['fields']['priority']['name']
-        except Exception: self.priority = None
-
-        try: self.assignee = issue['fields']['assignee']['displayName']
-        except Exception: self.assignee = None
-
-        try: self.duedate = datetime.strptime(issue['fields']['duedate'][:10], '%Y-%m-%d').date()
-        except Exception: self.duedate = None
-
-        try: self.resolution = issue['fields']['resolution']['name']
-        except Exception: self.resolution = None
+        self._issue = issue
 
-        try: self.resolutionDate = datetime.strptime(issue['fields']['resolutiondate'][:10], '%Y-%m-%d').date()
-        except Exception: self.resolutionDate = None
-
-        try: self.version = issue['fields']['fixVersions'][0]['name']
-        except Exception: self.version = 'Unscheduled'
-
-        try: self.releaseDate = datetime.strptime(issue['fields']['fixVersions'][0]['releaseDate'][:10], '%Y-%m-%d').date()
-        except Exception: self.releaseDate = None
-
-        try: self.linkedIssues = [LinkedIssue(item) for item in issue['fields']['issuelinks']]
-        except Exception:  self.linkedIssues = None
+    @property
+    def _fields(self):
+        return self._issue['fields']
+
+    @_field
+    def url(self):
+        return "https://{}/browse/{}".format(settings.server['JIRA'].domain,  self.key)
+
+    @_field
+    def id(self):
+        return self._issue['id']
+
+    @_field
+    def project(self):
+        return self._fields['project']['key']
+
+    @_field
+    def component(self):
+        return [item['id'] for item in self._fields['components']]
+
+    @_field
+    def summary(self):
+        return self._fields['summary'].strip()
+
+    @_field
+    def status(self):
+        return self._fields['status']['name']
+
+    @_field
+    def description(self):
+        return self._fields.get('description')
+
+    @_field
+    def reporter(self):
+        try: return self._fields['reporter']['displayName']
+        except Exception: return None
+
+    @_field
+    def created(self):
+        return jiraDate(self._fields['created'])
+
+    @_field
+    def updated(self):
+        return jiraDate(self._fields['updated'])
+
+    @_field
+    def priority(self):
+        try: return self._fields['priority']['name']
+        except Exception: return None
+
+    @_field
+    def assignee(self):
+        try: return self._fields['assignee']['displayName']
+        except Exception: return None
+
+    @_field
+    def duedate(self):
+        try: return jiraDate(self._fields['duedate'])
+        except Exception: return None
+
+    @_field
+    def resolution(self):
+        try: return self._fields['resolution']['name']
+        except Exception: return None
+
+    @_field
+    def resolutionDate(self):
+        try: return jiraDate(self._fields['resolutiondate'])
+        except Exception: return None
+
+    @_field
+    def version(self):
+        try: return self._fields['fixVersions'][0]['name']
+        except Exception: return 'Unscheduled'
+
+    @_field
+    def releaseDate(self):
+        try: return jiraDate(self._fields['fixVersions'][0]['releaseDate'])
+        except Exception: return None
+
+    @_field
+    def linkedIssues(self):
+        try: return [LinkedIssue(item) for item in self._fields['issuelinks']]
+        except Exception: return None
 
     @property
     def resolved(self):
@@ -141,12 +212,20 @@ class iBug(iHelpDeskIssue):
 
 
 class HelpDeskIssue(NIssue):
+    _jiraFields = ('customfield_11103', 'customfield_11105')
+
     def __init__(self, issue):
         super().__init__(issue)
-        try: self.chapter = issue['fields']['customfield_11103']
-        except Exception: self.chapter = None
-        try: self.enabler = issue['fields']['customfield_11105']
-        except Exception: self.enabler = None
+
+    @_field
+    def chapter(self):
+        try: return self._fields['customfield_11103']
+        except Exception: return None
+
+    @_field
+    def enabler(self):
+        try: return self._fields['customfield_11105']
+        except Exception: return None
 
     @property
     def channel(self):
@@ -178,13 +257,12 @@ class Monitor(HelpDeskIssue):
 class BacklogIssue(NIssue):
     def __init__(self, issue):
         super().__init__(issue)
+
+    @_field
+    def frame(self):
         _version = self.version.split()
         version = 'Unscheduled' if len(_version) == 1 else _version[1]
-        if version == 'Unscheduled': self.frame = 'Foreseen'
-        elif version in agileCalendar.pastTimeSlots: self.frame = 'Implemented'
-        elif version in agileCalendar.currentTimeSlots: self.frame = 'Working On'
-        elif version in agileCalendar.futureTimeSlots: self.frame = 'Foreseen'
-        else: self.frame = 'Unknown'
+        return agileCalendar.frameOf(version)
 
     @property
     def timeSlot(self):
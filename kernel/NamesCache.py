@@ -0,0 +1,55 @@
+import os
+import json
+import time
+import threading
+from kernel.Settings import settings
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class NamesCache:
+    """
+    Persistent key -> name map (user display names, component leaders, ...) kept in the cache home.
+    Every entry remembers when it was resolved; entries older than ttl hours are reported as expired
+    but are still served, so the books keep working offline or when JIRA is down.
+    """
+    def __init__(self, name, ttl=None):
+        self.filename = os.path.join(settings.storeHome, settings.cache['home'], '{}.json'.format(name))
+        self.ttl = (settings.cache['ttl'] if ttl is None else ttl) * 3600
+        self._lock = threading.Lock()
+        try:
+            with open(self.filename, 'r') as f:
+                self._entries = json.load(f)
+        except Exception:
+            self._entries = dict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getitem__(self, key):
+        return self._entries[key]['name']
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def expired(self, keys):
+        now = time.time()
+        return [key for key in keys if key not in self._entries or now - self._entries[key]['stored'] >= self.ttl]
+
+    def update(self, names):
+        now = time.time()
+        with self._lock:
+            for key in names:
+                self._entries[key] = {'name': names[key], 'stored': now}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            tmpfile = '{}.tmp'.format(self.filename)
+            with open(tmpfile, 'w') as f:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            os.replace(tmpfile, self.filename)
+
+
+if __name__ == "__main__":
+    pass
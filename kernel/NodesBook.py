@@ -2,21 +2,27 @@ __author__ = "Manuel Escriche <mev@tid.es>"
 
 import os
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from xml.etree import ElementTree as ET
+from kernel.Settings import settings
 from kernel.Connector import Connector
+from kernel.NamesCache import NamesCache
 
 
 class Node:
-    def __init__(self, node):
+    def __init__(self, node, book):
         self.name = node.get('name')
         tagsList = [child.tag for child in node]
         self.support = node.find('support').text if 'support' in tagsList else None
         self.mode = node.find('mode').text if 'mode' in tagsList else None
         self.helpdeskKeyword = node.find('helpdeskKeyword') if 'helpdeskKeyword' in tagsList else self.name
         self.workers = [item.text for item in node.findall('worker')]
-        try: self.owner = Connector.getInstance().displayName(self.support)
-        except: self.owner = self.support
-        # print('owner=', self.owner)
+        self._book = book
+
+    @property
+    def owner(self):
+        # display names are resolved for the whole book on first use
+        return self._book.owners().get(self.support, self.support)
 
 
 class NodesBook(OrderedDict):
@@ -38,9 +44,32 @@ class NodesBook(OrderedDict):
 
         for item in root.findall('node'):
             name = item.get('name')
-            self[name] = Node(item)
+            self[name] = Node(item, self)
 
         self.nodeByWorker = {worker: node for node in self for worker in self[node].workers}
+        self._owners = None
+
+    def _displayName(self, username):
+        try: return Connector.getInstance().displayName(username)
+        except Exception: return None
+
+    def owners(self):
+        if self._owners is not None:
+            return self._owners
+
+        names = NamesCache('displayNames')
+        supports = sorted({self[node].support for node in self if self[node].support})
+        pending = names.expired(supports)
+        if pending and settings.cache['offline'] != 'yes':
+            with ThreadPoolExecutor(max_workers=settings.http['workers']) as executor:
+                resolved = dict(zip(pending, executor.map(self._displayName, pending)))
+            resolved = {username: resolved[username] for username in resolved if resolved[username]}
+            if resolved:
+                names.update(resolved)
+                names.save()
+
+        self._owners = {username: names[username] for username in supports if username in names}
+        return self._owners
 
     def getNode(self, worker):
         try:
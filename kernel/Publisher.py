@@ -95,6 +95,8 @@ class PublisherItemRule(metaclass=abc.ABCMeta):
 
 
 class RoadMapTest(PublisherItemRule):
+    _jiraFields = ('issuetype', 'resolution', 'project', 'summary')
+
     def __init__(self, name, publisher):
         super().__init__(name)
         self.publisher = publisher
@@ -139,6 +141,8 @@ class RoadMapTest(PublisherItemRule):
 
 
 class MaterializingTest(PublisherItemRule):
+    _jiraFields = ('issuetype', 'resolution', 'project', 'summary', 'status')
+
     def __init__(self, name, publisher):
         super().__init__(name)
         self.publisher = publisher
@@ -192,6 +196,8 @@ class MaterializingTest(PublisherItemRule):
 
 
 class OpenDescriptionTest(PublisherItemRule):
+    _jiraFields = ('issuetype', 'project', 'summary')
+
     def __init__(self, name, url):
         super().__init__(name)
         _key = lambda i: '{0}.{1}'.format(name, i)
@@ -35,6 +35,8 @@ class BacklogItemRule(metaclass=abc.ABCMeta):
     def __getitem__(self, item): return self.description[item]
 
 class BasicFieldsBacklogTest(BacklogItemRule):
+    _jiraFields = ('issuetype', 'project', 'components', 'status', 'fixVersions')
+
     def __init__(self, name):
         super().__init__(name)
         _key = lambda i: '{0}.{1}'.format(name, i)
@@ -83,6 +85,8 @@ class BasicFieldsBacklogTest(BacklogItemRule):
 
 
 class TimeFrameBacklogTest(BacklogItemRule):
+    _jiraFields = ('issuetype', 'fixVersions')
+
     def __init__(self, name):
         super().__init__(name)
         _key = lambda i: '{0}.{1}'.format(self.name, i)
@@ -137,6 +141,8 @@ class TimeFrameBacklogTest(BacklogItemRule):
 
 
 class StatusBacklogTest(BacklogItemRule):
+    _jiraFields = ('issuetype', 'status', 'fixVersions')
+
     def __init__(self, name):
         super().__init__(name)
         _key = lambda i: '{0}.{1}'.format(self.name, i)
@@ -169,13 +175,14 @@ class StatusBacklogTest(BacklogItemRule):
         if item.status in entryWorkflow.defined and item.timeSlot == 'Unscheduled':
             return True
 
-        if item.status in entryWorkflow.future and item.nTimeSlot in agileCalendar.futureTimeSlots:
+        timeSlots = agileCalendar.timeSlots()
+        if item.status in entryWorkflow.future and item.nTimeSlot in timeSlots.future:
             return True
 
-        if item.status in entryWorkflow.present and item.nTimeSlot in agileCalendar.currentTimeSlots():
+        if item.status in entryWorkflow.present and item.nTimeSlot in timeSlots.current:
             return True
 
-        if item.status in entryWorkflow.past and item.nTimeSlot in agileCalendar.pastTimeSlots:
+        if item.status in entryWorkflow.past and item.nTimeSlot in timeSlots.past:
             return True
 
         return False
@@ -203,6 +210,8 @@ class StatusBacklogTest(BacklogItemRule):
         return
 
 class ReferenceBacklogTest(BacklogItemRule):
+    _jiraFields = ('summary', 'issuetype', 'components')
+
     def __init__(self, name):
         super().__init__(name)
         pattern = "(<project>\w+)[.](<entry>\w+)[.](<chapter>\w+)[.](<keyword>[a-zA-Z0-9_\-]+)[.](<item>[a-zA-Z0-9_\-]+([.][a-zA-Z0-9_\-]+)*)"
@@ -280,6 +289,8 @@ class ReferenceBacklogTest(BacklogItemRule):
         return
 
 class HierarchyBacklogTest(BacklogItemRule):
+    _jiraFields = ('summary', 'issuetype', 'status', 'resolution')
+
     def __init__(self, name):
         super().__init__(name)
         _key = lambda i: '{0}.{1}'.format(self.name, i)
@@ -303,70 +314,66 @@ class HierarchyBacklogTest(BacklogItemRule):
         if item.resolution == 'Dismissed': return True
         return False
 
+    # fathers and sons are kin tuples (kernel.Backlog.Kin): the members of some types and their
+    # statuses are gathered once for all the issues sharing them, the rules test sets
     def _rule_epics_with_features(self, item):
-        featureSons = len([_item  for _item in item.sons if _item.issueType in entryModel.midTermTypes]) if item.sons else 0
+        featureSons, statuses = item.sons.of(entryModel.midTermTypes)
         if item.status in entryWorkflow.defined and not featureSons: return True
-        return True if  featureSons > 0  else False
+        return True if featureSons else False
     def _rule_epics_with_features_status(self, item):
         if not item.sons:
             return True if item.status in entryWorkflow.defined else False
-        open_sons = all([_item.status in entryWorkflow.defined
-                            for _item in item.sons if _item.issueType in entryModel.midTermTypes])
+        sons, statuses = item.sons.of(entryModel.midTermTypes)
+        open_sons = statuses.issubset(entryWorkflow.defined)
         if open_sons and item.status in entryWorkflow.defined: return True
-        closed_sons = all([_item.status in entryWorkflow.closed
-                            for _item in item.sons if _item.issueType in entryModel.midTermTypes])
+        closed_sons = statuses.issubset(entryWorkflow.closed)
         if closed_sons and item.status in entryWorkflow.started: return True
-        started_sons = any([_item.status in entryWorkflow.started
-                            for _item in item.sons if _item.issueType in entryModel.midTermTypes])
+        started_sons = not statuses.isdisjoint(entryWorkflow.started)
         return True if item.status in entryWorkflow.onProcess and started_sons else False
 
     def _rule_features_with_epics(self, item):
-        epicsFather = len([_item  for _item in item.father if _item.issueType in entryModel.longTermTypes]) if item.father else 0
-        return True if epicsFather > 0 else False
+        epicsFather, statuses = item.father.of(entryModel.longTermTypes)
+        return True if epicsFather else False
     def _rule_features_with_epics_status(self, item):
         if not item.father:
             return True if item.status in entryWorkflow.defined else False
-        open_fathers = all([_item.status in entryWorkflow.defined
-                            for _item in item.father if _item.issueType in entryModel.longTermTypes])
+        fathers, statuses = item.father.of(entryModel.longTermTypes)
+        open_fathers = statuses.issubset(entryWorkflow.defined)
         if open_fathers:
             return True if item.status in entryWorkflow.defined else False
-        closed_fathers = all([_item.status in entryWorkflow.closed
-                            for _item in item.father if _item.issueType in entryModel.longTermTypes])
+        closed_fathers = statuses.issubset(entryWorkflow.closed)
         if closed_fathers:
             return True if item.status in entryWorkflow.closed else False
         return True
 
     def _rule_features_with_stories(self, item):
-        storySons = len([_item  for _item in item.sons if _item.issueType in entryModel.shortTermTypes]) if item.sons else 0
+        storySons, statuses = item.sons.of(entryModel.shortTermTypes)
         if item.status in entryWorkflow.defined and not storySons: return True
-        return True if  storySons > 0  else False
+        return True if storySons else False
 
     def _rule_features_with_stories_status(self, item):
         if not item.sons:
             return True if item.status in entryWorkflow.defined else False
-        open_sons = all([_item.status in entryWorkflow.defined
-                            for _item in item.sons if _item.issueType in entryModel.story])
+        sons, statuses = item.sons.of(entryModel.story)
+        open_sons = statuses.issubset(entryWorkflow.defined)
         if open_sons and item.status in entryWorkflow.defined: return True
-        closed_sons = all([_item.status in entryWorkflow.closed
-                            for _item in item.sons if _item.issueType in entryModel.story])
+        closed_sons = statuses.issubset(entryWorkflow.closed)
         if closed_sons and item.status in entryWorkflow.started: return True
-        started_sons = any([_item.status in entryWorkflow.started
-                            for _item in item.sons if _item.issueType in entryModel.story])
+        started_sons = not statuses.isdisjoint(entryWorkflow.started)
         return True if item.status in entryWorkflow.onProcess and started_sons else False
 
     def _rule_stories_with_features(self, item):
-        featureFathers = len([_item for _item in item.father if _item.issueType in entryModel.midTermTypes]) if item.father else 0
-        return True if featureFathers > 0 else False
+        featureFathers, statuses = item.father.of(entryModel.midTermTypes)
+        return True if featureFathers else False
     def _rule_stories_with_features_status(self, item):
         if not item.father:
             return True if item.status in entryWorkflow.defined else False
 
-        open_fathers = all([_item.status in entryWorkflow.defined
-                            for _item in item.father if _item.issueType in entryModel.midTermTypes])
+        fathers, statuses = item.father.of(entryModel.midTermTypes)
+        open_fathers = statuses.issubset(entryWorkflow.defined)
         if open_fathers:
             return True if item.status in entryWorkflow.defined else False
-        closed_fathers = all([_item.status in entryWorkflow.closed
-                            for _item in item.father if _item.issueType in entryModel.midTermTypes])
+        closed_fathers = statuses.issubset(entryWorkflow.closed)
         if closed_fathers:
              return True if item.status in entryWorkflow.closed else False
         return True
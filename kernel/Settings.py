@@ -9,7 +9,6 @@ __author__ = "Manuel Escriche < mev@tid.es>"
 class Settings:
     def __init__(self):
         self._dashboard = dict()
-        self._review = dict()
         self.home = os.path.split(os.path.dirname(os.path.abspath(__file__)))[0]
         self.configHome = os.path.join(self.home, 'config')
         self.storeHome = os.path.join(self.home, 'store')
@@ -29,20 +28,61 @@ class Settings:
         self.domain = root.find('domain').text
 
         self._servers = dict()
-        record = namedtuple('record', 'domain, username, password')
+        record = namedtuple('record', 'domain, username, password, scheme, login')
         for _server in root.findall('server'):
             name = _server.get('name')
             domain = _server.find('domain').text
             username = _server.find('username').text
             password = _server.find('password').text
-            self._servers[name] = record(domain, username, password)
+            # optional: 'https' or 'http'; 'root' (GET of the root page, must answer 200) or 'session'
+            scheme = _server.findtext('scheme', 'https')
+            login = _server.findtext('login', 'root')
+            self._servers[name] = record(domain, username, password, scheme, login)
+
+        self._http = self._section(root, 'http', {'pool_connections': 4, 'pool_maxsize': 16,
+                                                  'max_retries': 3, 'workers': 8})
+        self._snapshot = self._section(root, 'snapshot', {'mode': 'full', 'overlap': 5, 'workers': 4, 'retries': 2})
+        self._store = self._section(root, 'store', {'backend': 'pickle', 'trackers': 0, 'history': 60,
+                                                    'checkpoint': 10, 'columnar': 'no'})
+        self._cache = self._section(root, 'cache', {'enabled': 'yes', 'ttl': 24, 'home': 'cache', 'offline': 'no'})
+        self._review = self._section(root, 'review', {'workers': 0, 'parallel': 5000})
 
         # print(len(self.__chapters))
 
+    @staticmethod
+    def _section(root, tag, defaults):
+        # optional block of settings, values take the type of their default
+        section = dict(defaults)
+        _section = root.find(tag)
+        if _section is not None:
+            for item in _section:
+                section[item.tag] = type(defaults[item.tag])(item.text) if item.tag in defaults else item.text
+        return section
+
     @property
     def server(self):
         return self._servers
 
+    @property
+    def http(self):
+        return self._http
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def review(self):
+        return self._review
+
     @property
     def chapters(self):
         return 'Apps', 'Cloud', 'Data', 'IoT', 'I2ND', 'Security', 'WebUI', 'Ops', 'Academy', 'Catalogue', 'Lab'
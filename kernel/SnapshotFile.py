@@ -0,0 +1,93 @@
+import os
+import zlib
+import pickle
+import struct
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class SnapshotFile:
+    """
+    Snapshot of a list of issues:
+        header: magic, timestamp, number of issues - readable without decoding the body
+        body:   zlib-compressed blocks, each one prefixed by its length, holding up to
+                'block' length-prefixed pickled issues
+    Issues are written and read as streams, one block in memory at a time.
+    """
+    magic = b'FWSNAP01'
+    block = 256
+    _header = struct.Struct('>8s16sI')
+    _length = struct.Struct('>I')
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    @classmethod
+    def isSnapshot(cls, filename):
+        try:
+            with open(filename, 'rb') as f:
+                return f.read(len(cls.magic)) == cls.magic
+        except OSError:
+            return False
+
+    def _writeBlock(self, f, records):
+        body = zlib.compress(b''.join(records), 6)
+        f.write(SnapshotFile._length.pack(len(body)))
+        f.write(body)
+
+    def write(self, timestamp, issues):
+        tmpfile = '{}.tmp'.format(self.filename)
+        count = 0
+        with open(tmpfile, 'wb') as f:
+            f.write(SnapshotFile._header.pack(SnapshotFile.magic, timestamp.encode('ascii'), 0))
+            records = list()
+            for issue in issues:
+                record = pickle.dumps(issue, pickle.HIGHEST_PROTOCOL)
+                records.append(SnapshotFile._length.pack(len(record)) + record)
+                count += 1
+                if len(records) == SnapshotFile.block:
+                    self._writeBlock(f, records)
+                    records = list()
+            if records:
+                self._writeBlock(f, records)
+
+            # the number of issues is known once the stream is over
+            f.seek(0)
+            f.write(SnapshotFile._header.pack(SnapshotFile.magic, timestamp.encode('ascii'), count))
+        os.replace(tmpfile, self.filename)
+        return count
+
+    def _readHeader(self, f):
+        magic, timestamp, count = SnapshotFile._header.unpack(f.read(SnapshotFile._header.size))
+        if magic != SnapshotFile.magic:
+            raise ValueError('{} is not a snapshot file'.format(self.filename))
+        return timestamp.rstrip(b'\0').decode('ascii'), count
+
+    def header(self):
+        # (timestamp, count)
+        with open(self.filename, 'rb') as f:
+            return self._readHeader(f)
+
+    def __iter__(self):
+        with open(self.filename, 'rb') as f:
+            self._readHeader(f)
+            size = SnapshotFile._length.size
+            while True:
+                prefix = f.read(size)
+                if not prefix:
+                    return
+                body = zlib.decompress(f.read(SnapshotFile._length.unpack(prefix)[0]))
+                offset = 0
+                while offset < len(body):
+                    length = SnapshotFile._length.unpack_from(body, offset)[0]
+                    offset += size
+                    yield pickle.loads(body[offset:offset + length])
+                    offset += length
+
+    def load(self):
+        timestamp, count = self.header()
+        return list(self), timestamp
+
+
+if __name__ == "__main__":
+    pass
@@ -6,6 +6,7 @@ from requests import session
 from xml.etree import ElementTree as ET
 from collections import namedtuple
 from kernel.Settings import settings
+from kernel.Manifest import Manifest
 
 
 upload_record = namedtuple('upload_record', 'group_id, at_id')
@@ -68,30 +69,15 @@ class Uploader:
 
     def _upload_backlog(self, doc, scope):
         print("--upload backlog-- dest = forge-private-docs object = {0} topic = {1}".format(doc, scope))
-        fileList = os.listdir(settings.outHome)
-
-        mfilter = \
-            re.compile(r'\bFIWARE\.backlog\.(?P<doc>\w+)\.(?P<scope>[\w\-]+)\.(?P<day>\d{8})-(?P<hour>\d{4})\.xlsx\b')
-
-        # print(fileList)
-        xlsxfiles = [f for f in fileList if mfilter.match(f)]
-        # print(xlsxfiles)
-
-        record = namedtuple('record', 'filename, day, time')
-        files = [record(mfilter.match(f).group(0),
-                        mfilter.match(f).group('day'),
-                        mfilter.match(f).group('hour'))
-                 for f in xlsxfiles
-                 if mfilter.match(f).group('doc') == doc and mfilter.match(f).group('scope') == scope]
-
-        if not len(files):
+        manifest = Manifest.getInstance(settings.outHome)
+        manifest.adopt('backlog.{}'.format(doc),
+                       r'\bFIWARE\.backlog\.{}\.(?P<name>[\w\-]+)\.(?P<day>\d{{8}})-(?P<time>\d{{4}})\.xlsx\b'.format(doc))
+        try:
+            mfile = manifest.latest('backlog.{}'.format(doc), scope)
+        except FileNotFoundError:
             print('There is no object {0} in {1} to be uploaded'.format(doc, scope))
             return
 
-        files.sort(key=lambda e: (e.day, e.time), reverse=True)
-        mfile= files[0].filename
-        # mfile = files[-1][0]
-
         print('--upload-- file = {0}'.format(mfile))
 
         filename = os.path.join(settings.outHome, mfile)
@@ -109,24 +95,16 @@ class Uploader:
 
     def _upload_helpdesktech(self, doc, scope):
         print("--upload helpdesk-tech - dest = forge-private-docs doc = {0} scope = {1}".format(doc, scope))
-        fileList = os.listdir(settings.outHome)
-        mfilter = re.compile(r'\bFIWARE\.helpdesk-tech\.(?P<doc>\w+)\.(?P<scope>[\w\-]+)\.(?P<day>\d{8})\.xlsx\b')
-        # print(fileList)
-        xlsxfiles = [f for f in fileList if mfilter.match(f)]
-        # print(xlsxfiles)
-        record = namedtuple('record', 'filename, day')
-        files = [record(mfilter.match(f).group(0),
-                        mfilter.match(f).group('day'))
-                 for f in xlsxfiles
-                 if mfilter.match(f).group('doc') == doc and mfilter.match(f).group('scope') == scope]
-
-        if not len(files):
+        manifest = Manifest.getInstance(settings.outHome)
+        manifest.adopt('helpdesk-tech.{}'.format(doc),
+                       r'\bFIWARE\.helpdesk-tech\.{}\.(?P<name>[\w\-]+)\.(?P<day>\d{{8}})(-(?P<time>\d{{4}}))?\.xlsx\b'
+                       .format(doc))
+        try:
+            mfile = manifest.latest('helpdesk-tech.{}'.format(doc), scope)
+        except FileNotFoundError:
             print('There is no object {0} in {1} to be uploaded'.format(doc, scope))
             return
 
-        files.sort(key=lambda e: e.day, reverse=True)
-        mfile = files[0].filename
-        # mfile = files[-1][0]
         print('--upload-- file = {0}'.format(mfile))
 
         filename = os.path.join(settings.outHome, mfile)
@@ -0,0 +1,78 @@
+import random
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+from kernel.Settings import settings
+
+# the books are built on import: no JIRA lookups nor files in the store from the tests
+settings.cache['offline'] = 'yes'
+settings.storeHome = tempfile.mkdtemp()
+
+from kernel.Backlog import Backlog
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+class _Today(date):
+    # the agile calendar of the site books ends in 2017
+    @classmethod
+    def today(cls):
+        return cls(2016, 6, 15)
+
+
+def issue(n, issueType, summary, status):
+    return {'key': 'TEST-{}'.format(n), 'id': str(n), 'fields': {
+        'project': {'key': 'TEST', 'name': 'Test'}, 'status': {'name': status}, 'issuetype': {'name': issueType},
+        'priority': {'name': 'Major'}, 'assignee': None, 'reporter': None, 'resolution': None,
+        'components': [{'id': '1', 'name': 'Component'}],
+        'fixVersions': [{'name': 'Sprint 6.1.1', 'releaseDate': '2016-01-31'}],
+        'summary': summary, 'description': 'description', 'duedate': None, 'resolutiondate': None,
+        'created': '2016-01-01T00:00:00.000+0000', 'updated': '2016-02-01T00:00:00.000+0000'}}
+
+
+class TestParallelReview(unittest.TestCase):
+    def setUp(self):
+        self.review = dict(settings.review)
+
+    def tearDown(self):
+        settings.review.update(self.review)
+
+    @staticmethod
+    def backlog(size, plain):
+        # epics, features and stories of a few enablers, a share of them with a summary that is not a reference
+        rand = random.Random(2)
+        depths = {'Epic': 4, 'Feature': 5, 'Story': 6, 'Bug': 6, 'WorkItem': 6}
+        data = list()
+        for n in range(size):
+            issueType = rand.choice(list(depths))
+            parts = ['FIWARE', issueType, 'Cloud', 'En{}'.format(rand.randint(0, 3))] + \
+                    ['P{}'.format(rand.randint(0, 4)) for _ in range(depths[issueType] - 3)]
+            summary = '.'.join(parts[:depths[issueType] + (issueType != 'Epic')]) if rand.random() >= plain \
+                else 'plain summary {}'.format(n)
+            data.append(issue(n, issueType, summary, rand.choice(['Open', 'In Progress', 'Closed', 'Analysing'])))
+        return data
+
+    @staticmethod
+    def _review(data, parallel):
+        settings.review.update(workers=2, parallel=parallel)
+        with mock.patch('kernel.Calendar.date', _Today):
+            backlog = Backlog.fromData(data)
+            backlog.review()
+        return [(item.key, dict(item.test.status), {rule: dict(tests) for rule, tests in item.test.test.items()})
+                for item in backlog]
+
+    def test_parallel_review_as_serial(self):
+        # above the default threshold, a fifth of the issues sharing the same (empty) reference
+        data = self.backlog(6000, plain=0.2)
+        serial = self._review(data, parallel=len(data) + 1)
+        self.assertEqual(self._review(data, parallel=self.review['parallel']), serial)
+
+    def test_parallel_review_of_flat_backlog(self):
+        data = [issue(n, 'Bug', 'plain summary {}'.format(n), 'Open') for n in range(3000)]
+        serial = self._review(data, parallel=len(data) + 1)
+        self.assertEqual(self._review(data, parallel=1), serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from dateutil import tz
+from kernel.Settings import settings
+
+# the books are built on import: no JIRA lookups nor files in the store from the tests
+settings.cache['offline'] = 'yes'
+settings.storeHome = tempfile.mkdtemp()
+
+from kernel.DataFactory import DataEngine
+from kernel.Jira import JIRA
+from kernel.FieldsBook import fieldsBook
+
+__author__ = "Manuel Escriche <mev@tid.es>"
+
+
+def issue(key, updated, summary):
+    return {'key': key, 'id': key, 'fields': {'summary': summary, 'updated': updated}}
+
+
+class FakeJIRA:
+    def __init__(self, changes, keys):
+        self.changes = changes
+        self.keys = keys
+        self.since = None
+
+    def getTrackerData(self, tracker_id, updated_since=None):
+        self.since = updated_since
+        return [item for item in self.changes
+                if datetime.strptime(item['fields']['updated'], '%Y-%m-%dT%H:%M:%S.%f%z') >= updated_since]
+
+    def getTrackerKeys(self, tracker_id):
+        return self.keys
+
+
+class TestIncrementalSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.storage = tempfile.mkdtemp()
+        self.tracker = SimpleNamespace(keystone='TEST')
+
+    def tearDown(self):
+        shutil.rmtree(self.storage)
+
+    def test_change_within_overlap_is_merged(self):
+        # stored at 12:00 on a host clock far from the server's: only the server's own dates count
+        stored = [issue('TEST-1', '2016-06-15T10:00:00.000+0200', 'first'),
+                  issue('TEST-2', '2016-06-15T10:30:00.000+0200', 'second')]
+        DataEngine.Tracker('Test', self.storage).save(stored, '20160615-2359')
+
+        # updated 2 minutes before the latest stored update, after that snapshot was taken
+        changed = issue('TEST-1', '2016-06-15T10:28:00.000+0200', 'first, changed')
+        jira = FakeJIRA([changed], ['TEST-1', 'TEST-2'])
+
+        DataEngine._sync(jira, 'Test', self.tracker, self.storage)
+        data, timestamp = DataEngine.Tracker('Test', self.storage).load()
+
+        overlap = timedelta(minutes=settings.snapshot['overlap'])
+        self.assertEqual(jira.since, datetime(2016, 6, 15, 8, 30, tzinfo=timezone.utc) - overlap)
+        self.assertEqual([item['key'] for item in data], ['TEST-1', 'TEST-2'])
+        self.assertEqual(data[0]['fields']['summary'], 'first, changed')
+        self.assertEqual(data[1]['fields']['summary'], 'second')
+
+    def test_watermark_is_written_in_the_user_time_zone(self):
+        jira = JIRA.__new__(JIRA)
+        jira.root_url = 'https://jira.example.org'
+        JIRA._timeZone[jira.root_url] = tz.gettz('America/New_York')
+        moment = datetime(2016, 6, 15, 8, 25, 59, tzinfo=timezone.utc)
+        self.assertEqual(jira.jqlDate(moment), '"2016/06/15 04:25"')
+
+    def test_projection_holds_the_fields_read(self):
+        # NIssue.description, reporter and linkedIssues, Backlog.Issue description and reporter
+        fields = fieldsBook.fields(*JIRA.consumers)
+        for field in ('description', 'reporter', 'issuelinks'):
+            self.assertIn(field, fields)
+
+
+class TestStreamedSave(unittest.TestCase):
+    def setUp(self):
+        self.storage = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.storage)
+
+    def test_history_and_partition_are_recorded_from_the_stream(self):
+        tracker = DataEngine.Tracker('Test', self.storage)
+        versions = list()
+        for n in range(25):
+            data = [issue('TEST-{}'.format(k), '2016-06-{:02}T10:00:00.000+0200'.format(1 + (k + n) % 7), 'summary')
+                    for k in range(n % 4, 30)]
+            versions.append(data)
+            # the issues come one at a time, as they do from JIRA
+            tracker.save((item for item in data), '201606{:02}-1200'.format(1 + n))
+
+        history = tracker.history
+        for n in (0, 9, 10, 11, 24):
+            data, timestamp = history.load('201606{:02}-1200'.format(1 + n))
+            self.assertEqual(timestamp, '201606{:02}-1200'.format(1 + n))
+            self.assertEqual(data, versions[n])
+
+        data, timestamp = tracker.load()
+        self.assertEqual(data, versions[-1])
+        self.assertEqual(tracker.partition(data, timestamp), DataEngine.partitionOf(data))
+
+    def test_failed_save_leaves_history_as_it_was(self):
+        tracker = DataEngine.Tracker('Test', self.storage)
+        tracker.save([issue('TEST-1', '2016-06-15T10:00:00.000+0200', 'first')], '20160615-1200')
+
+        def broken():
+            yield issue('TEST-1', '2016-06-16T10:00:00.000+0200', 'changed')
+            raise ConnectionError('lost')
+
+        with self.assertRaises(ConnectionError):
+            tracker.save(broken(), '20160616-1200')
+        self.assertEqual(tracker.history.versions(), ['20160615-1200'])
+        self.assertEqual(tracker.load()[1], '20160615-1200')
+
+
+if __name__ == '__main__':
+    unittest.main()